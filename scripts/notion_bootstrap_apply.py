@@ -5,6 +5,7 @@
 기본 정책:
 - workspace 파일만 적용
 - global_codex 파일은 `--apply-global` 옵션을 줬을 때만 적용
+- 본문은 manifest의 `object`(sha256)로 객체 저장소에서 읽고, 없으면 번들 폴더의 파일을 읽는다
 """
 
 from __future__ import annotations
@@ -14,6 +15,7 @@ import json
 from pathlib import Path
 from typing import Dict, List
 
+import notion_store
 
 WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
 GLOBAL_CODEX_ROOT = Path.home() / ".codex"
@@ -27,7 +29,7 @@ def load_manifest(bundle_dir: Path) -> Dict:
 
 
 def resolve_destination(bundle_rel_path: str, apply_global: bool) -> Path | None:
-    p = Path(bundle_rel_path)
+    p = Path(notion_store.normalize_bundle_path(bundle_rel_path))
     parts = p.parts
     if not parts:
         return None
@@ -50,6 +52,7 @@ def apply_bundle(bundle_dir: Path, apply_global: bool, dry_run: bool) -> Dict[st
     if not isinstance(files, list):
         raise RuntimeError("manifest.json 형식이 올바르지 않습니다(files 누락).")
 
+    objects_dir = notion_store.resolve_store(bundle_dir, manifest)
     stats = {
         "applied": 0,
         "skipped": 0,
@@ -65,7 +68,11 @@ def apply_bundle(bundle_dir: Path, apply_global: bool, dry_run: bool) -> Dict[st
             stats["skipped"] += 1
             continue
 
-        src = bundle_dir / bundle_rel
+        sha256 = item.get("object")
+        if isinstance(sha256, str) and sha256:
+            src = notion_store.object_path(sha256, objects_dir)
+        else:
+            src = bundle_dir / notion_store.normalize_bundle_path(bundle_rel)
         if not src.exists():
             print(f"SKIP_MISSING_SOURCE={src}")
             stats["missing_source"] += 1
@@ -3,24 +3,37 @@
 Notion 설정 스냅샷 페이지에서 파일 본문을 추출해 로컬 bootstrap 번들을 생성한다.
 
 출력은 workspace 내부 `.bootstrap/notion/<timestamp>/`에 생성되며,
-원본 경로를 바로 덮어쓰지 않는다.
+원본 경로를 바로 덮어쓰지 않는다. 파일 본문은 `.bootstrap/objects/<sha256>`에 한 번만 저장되고
+번들 폴더에는 객체를 가리키는 manifest만 남는다.
+`--path`/`--glob`을 주면 고른 파일만 받는다(toggle 레이아웃 스냅샷은 해당 파일 블록만 조회한다).
+
+하위 명령:
+- `pull`(기본): 최신 스냅샷을 받아 번들을 만든다.
+- `migrate`: 본문 파일을 직접 담은 기존 번들을 객체 저장소로 옮겨 중복을 없앤다.
+- `gc`: 어떤 manifest도 참조하지 않는 객체를 지운다.
 """
 
 from __future__ import annotations
 
 import argparse
+import base64
+import codecs
 import datetime as dt
+import fnmatch
 import json
+import lzma
 import os
 import re
-import urllib.error
-import urllib.request
+import sys
+import tarfile
+import threading
+import zlib
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Tuple
 
-
-NOTION_API_BASE = "https://api.notion.com/v1"
-NOTION_VERSION = "2022-06-28"
+import notion_http
+import notion_registry
+import notion_store
 
 TOKEN_ENV = "NOTION_MCP_TOKEN"
 ROOT_PAGE_ID_ENV = "NOTION_SETTINGS_ROOT_PAGE_ID"
@@ -28,6 +41,7 @@ DEFAULT_ROOT_TITLE = "Notion MCP Server"
 SETTINGS_PAGE_TITLE = "codex_setting"
 ARCHIVE_PAGE_TITLE = "old"
 SNAPSHOT_TITLE_PREFIX = "Codex Settings Snapshot"
+CURRENT_PAGE_TITLE = f"{SNAPSHOT_TITLE_PREFIX} (current)"
 SNAPSHOT_TITLE_RE = re.compile(r"^Codex Settings Snapshot (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}Z)$")
 
 WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
@@ -69,25 +83,14 @@ def load_token_from_dotenv_if_missing() -> None:
             return
 
 
-def request(method: str, path: str, token: str, payload: Optional[Dict] = None) -> Tuple[int, str]:
-    data = None
-    if payload is not None:
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-
-    req = urllib.request.Request(f"{NOTION_API_BASE}{path}", data=data, method=method)
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Notion-Version", NOTION_VERSION)
-    req.add_header("Content-Type", "application/json")
-
-    try:
-        with urllib.request.urlopen(req, timeout=45) as resp:
-            return resp.status, resp.read().decode("utf-8", errors="replace")
-    except urllib.error.HTTPError as err:
-        try:
-            body = err.read().decode("utf-8", errors="replace")
-        except Exception:
-            body = ""
-        return err.code, body
+def request(
+    method: str,
+    path: str,
+    token: str,
+    payload: Optional[Dict] = None,
+    idempotent: Optional[bool] = None,
+) -> Tuple[int, str]:
+    return notion_http.request(method, path, token, payload, idempotent)
 
 
 def json_or_none(text: str) -> Optional[Dict]:
@@ -132,37 +135,137 @@ def extract_page_title(page_obj: Dict) -> str:
     return ""
 
 
+def iter_search_pages(token: str, query: str) -> Iterable[Dict]:
+    # 최근 수정 순으로 정렬해 모든 검색 결과 페이지를 next_cursor로 끝까지 순회한다.
+    cursor: Optional[str] = None
+    while True:
+        payload: Dict = {
+            "query": query,
+            "filter": {"property": "object", "value": "page"},
+            "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+            "page_size": 100,
+        }
+        if cursor:
+            payload["start_cursor"] = cursor
+        code, body = request("POST", "/search", token, payload, idempotent=True)
+        raise_if_failed(code, body, "페이지 검색")
+        parsed = json_or_none(body) or {}
+        results = parsed.get("results")
+        if not isinstance(results, list):
+            raise RuntimeError("페이지 검색 결과 형식 오류")
+        for page in results:
+            if isinstance(page, dict):
+                yield page
+        if not parsed.get("has_more"):
+            break
+        cursor = parsed.get("next_cursor")
+        if not isinstance(cursor, str) or not cursor:
+            break
+
+
 def find_root_page_id(token: str) -> str:
     pinned = os.getenv(ROOT_PAGE_ID_ENV, "").strip()
     if pinned:
         return pinned
 
-    payload = {
-        "query": DEFAULT_ROOT_TITLE,
-        "filter": {"property": "object", "value": "page"},
-        "page_size": 20,
-    }
-    code, body = request("POST", "/search", token, payload)
-    raise_if_failed(code, body, "루트 페이지 검색")
-    parsed = json_or_none(body) or {}
-    results = parsed.get("results")
-    if not isinstance(results, list):
-        raise RuntimeError("루트 페이지 검색 결과 형식 오류")
-
-    for page in results:
-        if isinstance(page, dict) and extract_page_title(page) == DEFAULT_ROOT_TITLE:
-            pid = page.get("id")
-            if isinstance(pid, str) and pid:
-                return pid
-    if results and isinstance(results[0], dict):
-        pid = results[0].get("id")
-        if isinstance(pid, str) and pid:
+    other_titles: List[str] = []
+    for page in iter_search_pages(token, DEFAULT_ROOT_TITLE):
+        pid = page.get("id")
+        if not isinstance(pid, str) or not pid:
+            continue
+        title = extract_page_title(page)
+        if title == DEFAULT_ROOT_TITLE:
             return pid
+        other_titles.append(title)
+    # 비슷한 제목의 다른 페이지를 짐작해 쓰면 엉뚱한 스냅샷을 복구하거나 레지스트리에 잘못된 ID가 남는다.
+    if other_titles:
+        raise RuntimeError(
+            f"'{DEFAULT_ROOT_TITLE}'와 정확히 일치하는 페이지가 없습니다(검색 결과: {', '.join(other_titles[:3])}). "
+            f"루트 페이지 ID를 {ROOT_PAGE_ID_ENV}에 지정하세요."
+        )
     raise RuntimeError(f"'{DEFAULT_ROOT_TITLE}' 페이지를 찾을 수 없습니다.")
 
 
-def list_block_children(token: str, block_id: str) -> List[Dict]:
-    out: List[Dict] = []
+def parse_notion_time(value: str) -> Optional[dt.datetime]:
+    try:
+        return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def is_settings_current_page(token: str, page: Dict, registry: notion_registry.PageRegistry) -> bool:
+    # 검색된 '(current)' 페이지가 settings 아래의 실제 제자리 페이지인지 확인한다(old로 복사된 예전 사본 제외).
+    pid = page.get("id")
+    registered = registry.get("current")
+    if registered and isinstance(pid, str):
+        if notion_registry.normalize_page_id(pid) == notion_registry.normalize_page_id(registered):
+            return True
+    parent = page.get("parent")
+    parent_id = parent.get("page_id") if isinstance(parent, dict) else None
+    if not isinstance(parent_id, str) or not parent_id:
+        return False
+    settings_page_id = registry.get("settings")
+    if settings_page_id and notion_registry.normalize_page_id(parent_id) == notion_registry.normalize_page_id(settings_page_id):
+        return True
+    # 레지스트리가 없거나 오래됐으면 부모 페이지 제목으로 확인한다(페이지 조회 1회).
+    code, body = request("GET", f"/pages/{parent_id}", token)
+    if not 200 <= code < 300:
+        return False
+    return extract_page_title(json_or_none(body) or {}) == SETTINGS_PAGE_TITLE
+
+
+def snapshot_title_time(title: str) -> Optional[dt.datetime]:
+    m = SNAPSHOT_TITLE_RE.match(title.strip())
+    if not m:
+        return None
+    return dt.datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%SZ").replace(tzinfo=dt.timezone.utc)
+
+
+def find_latest_snapshot_by_search(token: str) -> Optional[Tuple[str, str]]:
+    """
+    워크스페이스 전체에서 최신 스냅샷 페이지를 `/search` 한 번의 정렬 조회로 찾는다.
+
+    결과는 last_edited_time 내림차순이고, 스냅샷 제목 시각은 생성 시각이므로 항상
+    last_edited_time 이하다. 따라서 last_edited_time이 현재 최고 제목 시각보다 이른 결과가 나오면
+    그 뒤에는 더 최신 스냅샷이 없어 조회를 멈춘다(Notion은 수정 시각을 분 단위로 잘라 1분 여유를 둔다).
+
+    `--in-place` 동기화의 현재 페이지(제목에 시각 없음)는 마지막 수정 시각이 최신 제목 시각 이후면
+    그 페이지를 고른다(이전 타임스탬프 사본은 old에 남아 있어도 내용이 더 오래됐다).
+    같은 제목이라도 settings 아래에 있거나 레지스트리에 기록된 페이지만 현재 페이지로 인정한다.
+    """
+    best: Optional[Tuple[dt.datetime, str, str]] = None
+    current: Optional[Tuple[dt.datetime, str, str]] = None
+    registry: Optional[notion_registry.PageRegistry] = None
+    margin = dt.timedelta(minutes=1)
+    for page in iter_search_pages(token, SNAPSHOT_TITLE_PREFIX):
+        if page.get("archived") or page.get("in_trash"):
+            continue
+        edited = parse_notion_time(str(page.get("last_edited_time", "")))
+        if best and edited and edited + margin < best[0]:
+            break
+        title = extract_page_title(page)
+        pid = page.get("id")
+        if not isinstance(pid, str) or not pid:
+            continue
+        if title == CURRENT_PAGE_TITLE:
+            if edited and current is None:
+                registry = registry or notion_registry.PageRegistry.load(token)
+                if is_settings_current_page(token, page, registry):
+                    current = (edited, pid, title)
+            continue
+        stamp = snapshot_title_time(title)
+        if stamp is None:
+            continue
+        if best is None or stamp > best[0]:
+            best = (stamp, pid, title)
+    if current and (best is None or current[0] >= best[0]):
+        return current[1], current[2]
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+def iter_block_children_pages(token: str, block_id: str) -> Iterator[List[Dict]]:
     cursor: Optional[str] = None
     while True:
         suffix = f"?page_size=100{f'&start_cursor={cursor}' if cursor else ''}"
@@ -171,14 +274,56 @@ def list_block_children(token: str, block_id: str) -> List[Dict]:
         parsed = json_or_none(body) or {}
         results = parsed.get("results")
         if isinstance(results, list):
-            for item in results:
-                if isinstance(item, dict):
-                    out.append(item)
+            yield [item for item in results if isinstance(item, dict)]
         if not parsed.get("has_more"):
             break
         cursor = parsed.get("next_cursor")
         if not isinstance(cursor, str) or not cursor:
             break
+
+
+def list_block_children(token: str, block_id: str) -> List[Dict]:
+    return [blk for page in iter_block_children_pages(token, block_id) for blk in page]
+
+
+def fetch_block_tree(token: str, block_id: str, workers: Optional[int] = None) -> List[Dict]:
+    """
+    block_id 아래 블록 트리 전체를 문서 순서(부모 바로 뒤에 자식들)의 평탄한 목록으로 돌려준다.
+
+    has_children인 블록을 깊이별로 모아(BFS) 같은 깊이의 하위 목록을 동시에 조회하며,
+    요청 속도는 공유 토큰 버킷이 제한한다. 다른 병렬 작업 안에서 불리면 바깥 작업의 동시 실행 슬롯 안에서
+    차례로 조회한다. 각 블록의 하위 목록은 "children"에도 붙여 둔다.
+    """
+    top = list_block_children(token, block_id)
+    frontier = [blk for blk in top if blk.get("has_children") and isinstance(blk.get("id"), str)]
+    while frontier:
+        listings = notion_http.map_concurrently(
+            lambda blk: list_block_children(token, blk["id"]),
+            frontier,
+            workers,
+        )
+        next_frontier: List[Dict] = []
+        for parent, children in zip(frontier, listings):
+            parent["children"] = children
+            next_frontier.extend(
+                blk for blk in children if blk.get("has_children") and isinstance(blk.get("id"), str)
+            )
+        frontier = next_frontier
+    return flatten_blocks(top)
+
+
+def flatten_blocks(blocks: List[Dict]) -> List[Dict]:
+    out: List[Dict] = []
+    stack = [iter(blocks)]
+    while stack:
+        blk = next(stack[-1], None)
+        if blk is None:
+            stack.pop()
+            continue
+        out.append(blk)
+        children = blk.get("children")
+        if isinstance(children, list) and children:
+            stack.append(iter(children))
     return out
 
 
@@ -199,12 +344,52 @@ def find_child_page_by_title(token: str, parent_page_id: str, title: str) -> Opt
     return None
 
 
-def get_page_created_time(token: str, page_id: str) -> str:
+def get_page_time(token: str, page_id: str, key: str = "created_time") -> str:
     code, body = request("GET", f"/pages/{page_id}", token)
     raise_if_failed(code, body, "페이지 조회")
     parsed = json_or_none(body) or {}
-    created_time = parsed.get("created_time")
-    return created_time if isinstance(created_time, str) else ""
+    value = parsed.get(key)
+    return value if isinstance(value, str) else ""
+
+
+def get_page_created_time(token: str, page_id: str) -> str:
+    return get_page_time(token, page_id, "created_time")
+
+
+def find_unchanged_bundle(
+    bundles_dir: Path,
+    source_page_id: str,
+    last_edited_time: str,
+    path_filters: Optional[List[str]] = None,
+) -> Optional[Path]:
+    """
+    가장 최근 번들이 같은 스냅샷 페이지의 같은 수정 시각(같은 경로 필터)에서 만들어졌으면 그 번들 폴더를 돌려준다.
+
+    Notion의 last_edited_time은 분 단위로 잘리므로, 이전 번들이 그 분이 끝난 뒤에 만들어졌을 때만
+    같은 내용으로 본다(같은 분 안의 제자리 갱신을 놓치지 않기 위함).
+    """
+    latest = notion_store.latest_manifest(bundles_dir)
+    edited = parse_notion_time(last_edited_time) if last_edited_time else None
+    if latest is None or edited is None:
+        return None
+    bundle_dir, manifest = latest
+    if notion_registry.normalize_page_id(str(manifest.get("source_page_id", ""))) != notion_registry.normalize_page_id(
+        source_page_id
+    ):
+        return None
+    if manifest.get("source_last_edited_time") != last_edited_time:
+        return None
+    if manifest.get("path_filters", []) != (path_filters or []):
+        return None
+    try:
+        generated = dt.datetime.strptime(str(manifest.get("generated_at_utc", "")), "%Y-%m-%d %H:%M:%SZ")
+    except ValueError:
+        return None
+    if generated.replace(tzinfo=dt.timezone.utc) < edited + dt.timedelta(minutes=1):
+        return None
+    if not notion_store.bundle_is_complete(bundle_dir, manifest):
+        return None
+    return bundle_dir
 
 
 def snapshot_sort_key(title: str, created_time: str) -> Tuple[int, str]:
@@ -214,10 +399,30 @@ def snapshot_sort_key(title: str, created_time: str) -> Tuple[int, str]:
     return (0, created_time)
 
 
+def parse_reference_entry(blk: Dict) -> Optional[Tuple[str, str]]:
+    code_obj = blk.get("code") if blk.get("type") == "code" else None
+    if not isinstance(code_obj, dict):
+        return None
+    entry = json_or_none(rich_text_to_plain(code_obj.get("rich_text")))
+    if not entry:
+        return None
+    page_id = entry.get("page_id")
+    title = str(entry.get("title", "")).strip()
+    if not isinstance(page_id, str) or not page_id or not title.startswith(SNAPSHOT_TITLE_PREFIX):
+        return None
+    return page_id, title
+
+
 def collect_snapshot_candidates(token: str, parent_page_id: str) -> List[Tuple[str, str, str]]:
     candidates: List[Tuple[str, str, str]] = []
     children = list_block_children(token, parent_page_id)
-    for blk in children:
+    for index, blk in enumerate(children):
+        if blk.get("type") == "link_to_page":
+            # 참조 방식 보관 색인: link_to_page 다음 JSON code 블록에 원본 제목/ID가 있다.
+            ref = parse_reference_entry(children[index + 1] if index + 1 < len(children) else {})
+            if ref:
+                candidates.append((ref[0], ref[1], ""))
+            continue
         if blk.get("type") != "child_page":
             continue
         title = ""
@@ -229,63 +434,480 @@ def collect_snapshot_candidates(token: str, parent_page_id: str) -> List[Tuple[s
         page_id = blk.get("id")
         if not isinstance(page_id, str) or not page_id:
             continue
-        created = get_page_created_time(token, page_id)
-        candidates.append((page_id, title, created))
+        # child_page 블록의 created_time은 페이지 created_time과 같으므로 목록 값을 그대로 쓴다.
+        created = blk.get("created_time")
+        candidates.append((page_id, title, created if isinstance(created, str) else ""))
     return candidates
 
 
-def find_latest_snapshot_page(token: str, root_page_id: str) -> Tuple[str, str]:
+def pick_latest_snapshot(
+    token: str,
+    candidates: List[Tuple[str, str, str]],
+    live_current: bool = False,
+) -> Tuple[str, str]:
+    """
+    후보 중 최신 스냅샷을 고른다.
+
+    `live_current`(settings 아래 후보)이면 '(current)' 페이지는 마지막 수정 시각을 최신 후보의 제목 시각과 비교해
+    그 이후에 갱신됐을 때 고른다(참조 방식 보관은 원본을 settings에 남기므로 제목 시각만으로는 판단할 수 없다).
+    그 밖의 '(current)' 제목은 old로 복사된 예전 사본이라 다른 후보가 없을 때만 쓴다.
+    """
+    others = [c for c in candidates if c[1] != CURRENT_PAGE_TITLE]
+    currents = [c for c in candidates if c[1] == CURRENT_PAGE_TITLE]
+    if not others:
+        return currents[0][0], currents[0][1]
+
+    # 제목 시각을 파싱할 수 있는 후보가 하나라도 있으면 created_time 없이 순위가 결정된다.
+    titled = [c for c in others if SNAPSHOT_TITLE_RE.match(c[1].strip())]
+    if titled:
+        page_id, title, created = max(titled, key=lambda x: snapshot_sort_key(x[1], x[2]))
+    else:
+        # 목록에 created_time이 빠진 후보만 페이지를 직접 조회한다.
+        resolved = [
+            (page_id, title, created or get_page_created_time(token, page_id))
+            for page_id, title, created in others
+        ]
+        page_id, title, created = max(resolved, key=lambda x: snapshot_sort_key(x[1], x[2]))
+
+    if live_current and currents:
+        made = snapshot_title_time(title) or parse_notion_time(created or get_page_created_time(token, page_id))
+        current_id = currents[0][0]
+        edited = parse_notion_time(get_page_time(token, current_id, "last_edited_time"))
+        if edited and (made is None or edited >= made):
+            return current_id, CURRENT_PAGE_TITLE
+    return page_id, title
+
+
+def resolve_snapshot_parents(token: str) -> Tuple[str, Optional[str], Optional[str]]:
+    registry = notion_registry.PageRegistry.load(token)
+    root_page_id = registry.get("root")
+    settings_page_id = registry.get("settings")
+    pinned = os.getenv(ROOT_PAGE_ID_ENV, "").strip()
+    if pinned and root_page_id and notion_registry.normalize_page_id(pinned) != notion_registry.normalize_page_id(root_page_id):
+        root_page_id = None
+
+    # 저장된 settings ID는 GET 한 번으로 확인하고(부모=root), 사라졌을 때만 재탐색한다.
+    if root_page_id and settings_page_id and notion_registry.page_is_live(token, settings_page_id, root_page_id):
+        return root_page_id, settings_page_id, registry.get("archive")
+
+    # 확인에 실패한 ID만 잊는다. 동기화가 저장해 둔 archive(old) ID는 남겨 두고,
+    # settings가 바뀌었으면 find_latest_snapshot_page가 부모 확인에서 걸러 다시 찾는다.
+    registry.forget("settings", *(() if root_page_id else ("root",)))
+    root_page_id = find_root_page_id(token)
     settings_page_id = find_child_page_by_title(token, root_page_id, SETTINGS_PAGE_TITLE)
+    registry.update(root=root_page_id, settings=settings_page_id or "")
+    save_registry(registry)
+    return root_page_id, settings_page_id, registry.get("archive")
+
+
+def save_registry(registry: notion_registry.PageRegistry) -> None:
+    try:
+        registry.save()
+    except OSError as exc:
+        print(f"페이지 ID 레지스트리 저장 실패(무시): {exc}", file=sys.stderr)
+
+
+def find_latest_snapshot_page(
+    token: str,
+    root_page_id: str,
+    settings_page_id: Optional[str] = None,
+    archive_page_id: Optional[str] = None,
+) -> Tuple[str, str]:
+    if settings_page_id is None:
+        settings_page_id = find_child_page_by_title(token, root_page_id, SETTINGS_PAGE_TITLE)
     if settings_page_id:
         settings_candidates = collect_snapshot_candidates(token, settings_page_id)
         if settings_candidates:
-            settings_candidates.sort(key=lambda x: snapshot_sort_key(x[1], x[2]))
-            page_id, title, _ = settings_candidates[-1]
-            return page_id, title
+            return pick_latest_snapshot(token, settings_candidates, live_current=True)
 
     candidates: List[Tuple[str, str, str]] = collect_snapshot_candidates(token, root_page_id)
 
     if not candidates and settings_page_id:
-        old_page_id = find_child_page_by_title(token, settings_page_id, ARCHIVE_PAGE_TITLE)
+        # 저장된 old ID는 실제로 필요할 때만 확인한다.
+        old_page_id = archive_page_id
+        if not old_page_id or not notion_registry.page_is_live(token, old_page_id, settings_page_id):
+            old_page_id = find_child_page_by_title(token, settings_page_id, ARCHIVE_PAGE_TITLE)
+            if old_page_id:
+                registry = notion_registry.PageRegistry.load(token)
+                registry.update(archive=old_page_id)
+                save_registry(registry)
         if old_page_id:
             candidates = collect_snapshot_candidates(token, old_page_id)
 
     if not candidates:
         raise RuntimeError("복구 가능한 스냅샷 페이지를 찾지 못했습니다.")
 
-    candidates.sort(key=lambda x: snapshot_sort_key(x[1], x[2]))
-    page_id, title, _ = candidates[-1]
-    return page_id, title
-
-
-def parse_snapshot_files(blocks: List[Dict]) -> Dict[str, str]:
-    files: Dict[str, str] = {}
-    current_path: Optional[str] = None
+    return pick_latest_snapshot(token, candidates)
+
+
+FILE_META_KEYS = ("sha256", "chars", "body", "ref_page_id", "encoding")
+DECOMPRESSORS = {
+    "zlib+base85": zlib.decompressobj,
+    "lzma+base85": lzma.LZMADecompressor,
+}
+DECODE_ERRORS = (ValueError, EOFError, zlib.error, lzma.LZMAError, UnicodeDecodeError)
+PREFETCH_BLOCKS = 200
+ARCHIVE_READ_BYTES = 64 * 1024
+
+
+class BodyDecoder:
+    """
+    압축 인코딩(zlib/lzma + base85) 본문을 code 블록 단위로 받아 평문 조각으로 바로 풀어낸다.
+
+    base85는 5글자 묶음 단위로만 끊어 디코딩하고, 남은 글자는 다음 조각과 이어 붙인다.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        factory = DECOMPRESSORS.get(encoding)
+        if factory is None:
+            raise ValueError(f"지원하지 않는 본문 인코딩: {encoding}")
+        self._decompressor = factory()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        data = self._pending + "".join(chunk.split())
+        cut = len(data) - len(data) % 5
+        self._pending = data[cut:]
+        raw = base64.b85decode(data[:cut]) if cut else b""
+        return self._utf8.decode(self._decompressor.decompress(raw))
+
+    def finish(self) -> str:
+        raw = base64.b85decode(self._pending) if self._pending else b""
+        out = self._decompressor.decompress(raw) if raw or not self._decompressor.eof else b""
+        if hasattr(self._decompressor, "flush"):
+            out += self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise ValueError("압축 본문이 중간에 끊겼습니다.")
+        return self._utf8.decode(out, final=True)
+
+
+class BundleWriter:
+    """
+    파일별 객체 저장소 쓰기 핸들을 열어 본문 조각을 바로 이어 쓰고, sha256/길이를 쓰는 동안 누적한다.
+
+    본문은 `.bootstrap/objects/<sha256>`에 저장되고 번들 폴더에는 manifest/README만 남는다.
+    참조 페이지를 동시에 읽는 파서들이 함께 쓰므로 결과 목록 갱신은 잠금으로 보호한다(경로는 서로 다름).
+    """
+
+    def __init__(self, objects_dir: Path = notion_store.OBJECTS_DIR) -> None:
+        self.objects_dir = objects_dir
+        self.written: Dict[str, Dict[str, object]] = {}
+        self._handles: Dict[str, Tuple[notion_store.ObjectWriter, List[int]]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, original_path: str) -> None:
+        # 같은 경로가 다시 나오면 앞선 본문을 버리고 새로 쓴다.
+        self.finish(original_path)
+        rel = map_output_path(original_path)
+        handle = notion_store.ObjectWriter(self.objects_dir)
+        with self._lock:
+            self._handles[original_path] = (handle, [0])
+            self.written[original_path] = {"bundle_path": rel.as_posix()}
 
-    for blk in blocks:
+    def write(self, original_path: str, text: str) -> None:
+        if not text:
+            return
+        handle, counts = self._handles[original_path]
+        handle.write(text.encode("utf-8", errors="replace"))
+        counts[0] += len(text)
+
+    def finish(self, original_path: str) -> None:
+        with self._lock:
+            opened = self._handles.pop(original_path, None)
+        if opened is None:
+            return
+        handle, counts = opened
+        sha256 = handle.commit()
+        with self._lock:
+            self.written[original_path].update(
+                object=sha256,
+                sha256=sha256,
+                chars=counts[0],
+                bytes=handle.size,
+            )
+
+    def close(self) -> None:
+        for original_path in list(self._handles):
+            self.finish(original_path)
+
+    def abort(self) -> None:
+        # 실패한 pull에서 아직 쓰는 중이던 본문은 객체로 남기지 않는다.
+        with self._lock:
+            opened, self._handles = self._handles, {}
+        for handle, _ in opened.values():
+            handle.abort()
+
+
+class SnapshotStreamParser:
+    """
+    스냅샷 블록을 문서 순서대로 하나씩 받아 파일 메타데이터를 모으고 본문은 BundleWriter로 바로 흘려보낸다.
+
+    wanted가 주어지면 그 경로의 본문만 쓴다(증분 참조 페이지, --path/--glob 선택 복원용).
+    """
+
+    def __init__(
+        self,
+        writer: BundleWriter,
+        meta: Dict[str, Dict[str, str]],
+        wanted: Optional[Container[str]] = None,
+    ) -> None:
+        self.writer = writer
+        self.meta = meta
+        self.wanted = wanted
+        self.is_tar = False
+        self.archive_url: Optional[str] = None
+        self._path: Optional[str] = None
+        self._opened = False
+        self._decoder: Optional[BodyDecoder] = None
+
+    def _end_file(self) -> None:
+        path, self._path = self._path, None
+        if path is None:
+            return
+        info = self.meta.get(path, {})
+        try:
+            if self._opened and self._decoder is not None:
+                self.writer.write(path, self._decoder.finish())
+        except DECODE_ERRORS:
+            info["decode_error"] = "1"
+        # 본문이 비어 있는 파일도 원본과 같게 빈 파일로 남긴다(본문이 없다고 기록된 파일 제외).
+        if not self._opened and self._accepts(path) and info.get("body") not in ("omitted", "missing", "ref"):
+            self.writer.start(path)
+        self.writer.finish(path)
+        self._opened = False
+        self._decoder = None
+
+    def _accepts(self, path: str) -> bool:
+        return self.wanted is None or path in self.wanted
+
+    def feed(self, blk: Dict) -> None:
         btype = blk.get("type")
         if btype in ("heading_1", "heading_2", "heading_3"):
-            current_path = None
-            continue
+            self._end_file()
+            return
 
         if btype == "bulleted_list_item":
             item = blk.get("bulleted_list_item")
             text = ""
             if isinstance(item, dict):
                 text = rich_text_to_plain(item.get("rich_text")).strip()
-            if text.lower().startswith("path:"):
-                current_path = text.split(":", 1)[1].strip()
-                if current_path:
-                    files.setdefault(current_path, "")
-            continue
+            key, _, value = text.partition(":")
+            key = key.strip().lower()
+            if text.lower() == "layout: tar":
+                self.is_tar = True
+            elif key == "path":
+                self._end_file()
+                path = value.strip()
+                if path:
+                    self._path = path
+                    self.meta[path] = {}
+            elif key in FILE_META_KEYS and self._path:
+                self.meta[self._path][key] = value.strip()
+            return
 
-        if btype == "code" and current_path:
+        if btype == "code" and self._path and self._accepts(self._path):
             code_obj = blk.get("code")
-            if isinstance(code_obj, dict):
-                chunk = rich_text_to_plain(code_obj.get("rich_text"))
-                files[current_path] = files.get(current_path, "") + chunk
+            if not isinstance(code_obj, dict):
+                return
+            chunk = rich_text_to_plain(code_obj.get("rich_text"))
+            info = self.meta[self._path]
+            if not self._opened:
+                self.writer.start(self._path)
+                self._opened = True
+                if info.get("encoding"):
+                    try:
+                        self._decoder = BodyDecoder(info["encoding"])
+                    except ValueError:
+                        info["decode_error"] = "1"
+            if info.get("decode_error"):
+                return
+            if self._decoder is not None:
+                try:
+                    chunk = self._decoder.feed(chunk)
+                except DECODE_ERRORS:
+                    info["decode_error"] = "1"
+                    return
+            self.writer.write(self._path, chunk)
+            return
+
+        if btype == "file" and self.is_tar and not self.archive_url:
+            file_obj = blk.get("file")
+            hosted = file_obj.get(file_obj.get("type", "file")) if isinstance(file_obj, dict) else None
+            url = hosted.get("url") if isinstance(hosted, dict) else None
+            if isinstance(url, str) and url:
+                self.archive_url = url
 
-    return files
+    def close(self) -> None:
+        self._end_file()
+
+
+def parse_snapshot_stream(
+    blocks: Iterable[Dict],
+    writer: BundleWriter,
+    meta: Dict[str, Dict[str, str]],
+    wanted: Optional[Container[str]] = None,
+) -> None:
+    parser = SnapshotStreamParser(writer, meta, wanted)
+    for blk in blocks:
+        parser.feed(blk)
+    parser.close()
+    # tar 레이아웃 스냅샷: "layout: tar" 항목 뒤의 첫 file 블록이 전체 아카이브다.
+    if parser.archive_url:
+        read_snapshot_archive(parser.archive_url, writer, meta, wanted)
+
+
+ARCHIVE_MANIFEST_NAME = "manifest.json"
+
+
+def read_snapshot_archive(
+    url: str,
+    writer: BundleWriter,
+    meta: Dict[str, Dict[str, str]],
+    wanted: Optional[Container[str]] = None,
+) -> None:
+    # 다운로드 응답을 디스크에 저장하지 않고 tar 스트림으로 한 번에 읽는다(manifest.json이 맨 앞).
+    by_member: Dict[str, str] = {}
+    with notion_http.open_download(url) as resp, tarfile.open(fileobj=resp, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            handle = tar.extractfile(member)
+            if handle is None:
+                continue
+            if member.name == ARCHIVE_MANIFEST_NAME:
+                manifest = json.loads(handle.read().decode("utf-8"))
+                for entry in manifest.get("files", []):
+                    path = entry.get("path")
+                    if not isinstance(path, str) or not path:
+                        continue
+                    meta[path] = {
+                        key: str(entry[key]) for key in ("sha256", "chars", "body") if key in entry
+                    }
+                    if entry.get("member"):
+                        by_member[entry["member"]] = path
+                continue
+            if not by_member:
+                raise RuntimeError("스냅샷 아카이브의 manifest.json이 본문보다 앞에 있어야 합니다.")
+            path = by_member.get(member.name)
+            if not path or (wanted is not None and path not in wanted):
+                continue
+            writer.start(path)
+            text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while True:
+                data = handle.read(ARCHIVE_READ_BYTES)
+                writer.write(path, text.decode(data, final=not data))
+                if not data:
+                    break
+            writer.finish(path)
+
+
+def toggle_file_path(blk: Dict) -> Optional[str]:
+    # toggle 레이아웃 스냅샷은 파일마다 "file: <path>" toggle 아래에 메타데이터/본문을 둔다.
+    toggle = blk.get("toggle") if blk.get("type") == "toggle" else None
+    if not isinstance(toggle, dict):
+        return None
+    key, _, value = rich_text_to_plain(toggle.get("rich_text")).partition(":")
+    if key.strip().lower() != "file" or not value.strip():
+        return None
+    return value.strip()
+
+
+def should_expand(blk: Dict, wanted: Optional[Container[str]] = None) -> bool:
+    if not blk.get("has_children") or not isinstance(blk.get("id"), str):
+        return False
+    path = toggle_file_path(blk) if wanted is not None else None
+    return path is None or path in wanted  # type: ignore[operator]
+
+
+def iter_block_tree(
+    token: str,
+    block_id: str,
+    workers: Optional[int] = None,
+    wanted: Optional[Container[str]] = None,
+) -> Iterator[Dict]:
+    # 목록 한 페이지(최대 100개)씩 받아 하위 트리가 있는 블록만 동시에 펼친 뒤 문서 순서로 내보낸다.
+    # wanted가 주어지면 그 밖의 파일 toggle은 펼치지 않아 요청 수가 받을 파일 크기만큼만 든다.
+    for page in iter_block_children_pages(token, block_id):
+        parents = [blk for blk in page if should_expand(blk, wanted)]
+        subtrees = notion_http.map_concurrently(
+            lambda blk: fetch_block_tree(token, blk["id"], workers),
+            parents,
+            workers,
+        )
+        expanded = {blk["id"]: subtree for blk, subtree in zip(parents, subtrees)}
+        for blk in page:
+            yield blk
+            yield from expanded.get(blk.get("id"), [])
+
+
+def stream_snapshot_page(
+    token: str,
+    page_id: str,
+    writer: BundleWriter,
+    meta: Dict[str, Dict[str, str]],
+    wanted: Optional[Container[str]] = None,
+) -> None:
+    # 블록 목록 조회는 백그라운드에서 앞서 진행하고, 받은 블록은 곧바로 파싱/파일 쓰기로 넘긴다.
+    blocks = notion_http.prefetch(iter_block_tree(token, page_id, wanted=wanted), PREFETCH_BLOCKS)
+    try:
+        parse_snapshot_stream(blocks, writer, meta, wanted)
+    finally:
+        blocks.close()  # type: ignore[attr-defined]
+
+
+def resolve_file_refs(
+    token: str,
+    writer: BundleWriter,
+    meta: Dict[str, Dict[str, str]],
+) -> None:
+    # 증분 스냅샷에서 본문 대신 참조로 기록된 파일은 본문이 있는 이전 스냅샷 페이지에서 채운다.
+    refs: Dict[str, set[str]] = {}
+    for path, info in meta.items():
+        if info.get("body") == "ref" and info.get("ref_page_id"):
+            refs.setdefault(info["ref_page_id"], set()).add(path)
+    if not refs:
+        return
+
+    def load_ref_page(ref_page_id: str) -> Dict[str, Dict[str, str]]:
+        ref_meta: Dict[str, Dict[str, str]] = {}
+        stream_snapshot_page(token, ref_page_id, writer, ref_meta, refs[ref_page_id])
+        return ref_meta
+
+    ref_page_ids = sorted(refs)
+    for ref_page_id, ref_meta in zip(ref_page_ids, notion_http.map_concurrently(load_ref_page, ref_page_ids)):
+        for path in refs[ref_page_id]:
+            if ref_meta.get(path, {}).get("body") in ("ref", "omitted", "missing"):
+                continue
+            if path in writer.written:
+                meta[path]["body"] = f"ref:{ref_page_id}"
+                if ref_meta.get(path, {}).get("decode_error"):
+                    meta[path]["decode_error"] = "1"
+
+
+def verify_files(written: Dict[str, Dict[str, object]], meta: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    # verified: 해시/길이 일치, mismatch: 불일치, omitted: 한도 초과로 본문 없음,
+    # missing: 동기화 시점에 원본 파일 없음, unresolved: 참조 본문을 찾지 못함,
+    # unverified: 해시 없는 구버전 스냅샷
+    statuses: Dict[str, str] = {}
+    for path, info in meta.items():
+        result = written.get(path, {})
+        if info.get("body") in ("omitted", "missing"):
+            statuses[path] = info["body"]
+        elif info.get("body") == "ref" or path not in written:
+            # 참조 대상 페이지에서 본문을 찾지 못함
+            statuses[path] = "unresolved"
+        elif info.get("decode_error"):
+            statuses[path] = "mismatch"
+        elif not info.get("sha256"):
+            statuses[path] = "unverified"
+        elif result.get("sha256") == info["sha256"] and str(result.get("chars")) == info.get(
+            "chars", str(result.get("chars"))
+        ):
+            statuses[path] = "verified"
+        else:
+            statuses[path] = "mismatch"
+    return statuses
 
 
 def safe_rel(path_str: str) -> str:
@@ -347,33 +969,70 @@ def map_output_path(original_path: str) -> Path:
     return Path("workspace") / Path(safe_rel(normalized))
 
 
+class PathFilter:
+    """
+    --path/--glob으로 고른 파일만 받도록 스냅샷 경로를 거른다(`in` 연산으로 wanted 자리에 그대로 쓴다).
+
+    스냅샷 원본 경로(`$WORKSPACE/AGENTS.md`), 번들 경로(`workspace/AGENTS.md`),
+    번들 경로에서 workspace/global_codex 머리를 뗀 경로(`AGENTS.md`) 중 하나라도 맞으면 포함한다.
+    glob은 fnmatch로 맞추므로 `*`가 `/`도 넘는다(`docs/*.md`가 `docs/a/b.md`까지 포함, `**` 문법은 없음).
+    """
+
+    def __init__(self, paths: Iterable[str] = (), globs: Iterable[str] = ()) -> None:
+        self.paths = {p.replace("\\", "/").strip() for p in paths if p.strip()}
+        self.globs = [g.replace("\\", "/").strip() for g in globs if g.strip()]
+
+    def __bool__(self) -> bool:
+        return bool(self.paths or self.globs)
+
+    def __contains__(self, original_path: object) -> bool:
+        if not isinstance(original_path, str):
+            return False
+        rel = map_output_path(original_path).as_posix()
+        names = (original_path.replace("\\", "/"), rel, rel.partition("/")[2])
+        if any(name in self.paths for name in names):
+            return True
+        return any(fnmatch.fnmatchcase(name, pattern) for name in names for pattern in self.globs)
+
+    def describe(self) -> List[str]:
+        return sorted(f"path:{p}" for p in self.paths) + sorted(f"glob:{g}" for g in self.globs)
+
+
 def write_bundle(
-    files: Dict[str, str],
+    written: Dict[str, Dict[str, object]],
     output_dir: Path,
     source_page_id: str,
     source_page_title: str,
+    statuses: Optional[Dict[str, str]] = None,
+    objects_dir: Path = notion_store.OBJECTS_DIR,
+    source_last_edited_time: str = "",
+    path_filters: Optional[List[str]] = None,
 ) -> None:
+    # 파일 본문은 파싱 중에 BundleWriter가 객체 저장소에 이미 썼으므로 여기서는 manifest/README만 만든다.
     output_dir.mkdir(parents=True, exist_ok=True)
+    statuses = statuses or {}
 
     manifest = {
         "generated_at_utc": dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ"),
         "source_page_id": source_page_id,
         "source_page_title": source_page_title,
+        "source_last_edited_time": source_last_edited_time,
+        "path_filters": path_filters or [],
         "workspace_root": str(WORKSPACE_ROOT),
         "global_codex_root": str(GLOBAL_CODEX_ROOT),
+        "object_store": notion_store.store_ref(output_dir, objects_dir),
         "files": [],
     }
 
-    for original_path, content in sorted(files.items(), key=lambda kv: kv[0].lower()):
-        rel = map_output_path(original_path)
-        target = output_dir / rel
-        target.parent.mkdir(parents=True, exist_ok=True)
-        target.write_text(content, encoding="utf-8", errors="replace")
+    for original_path, result in sorted(written.items(), key=lambda kv: kv[0].lower()):
         manifest["files"].append(
             {
                 "original_path": original_path,
-                "bundle_path": str(rel),
-                "bytes": len(content.encode("utf-8", errors="replace")),
+                "bundle_path": result["bundle_path"],
+                "object": result.get("object", ""),
+                "bytes": result.get("bytes", 0),
+                "sha256": result.get("sha256", ""),
+                "verification": statuses.get(original_path, "unverified"),
             }
         )
 
@@ -390,9 +1049,10 @@ def write_bundle(
         "",
         "## 적용 가이드",
         "1. `manifest.json`을 열어 필요한 파일 목록을 확인합니다.",
-        "2. `workspace/` 하위 파일은 현재 레포에 덮어쓰기 전 diff를 확인합니다.",
-        "3. `global_codex/` 하위 파일은 `~/.codex`로 수동 복사합니다.",
-        "4. 민감정보(토큰/키)는 별도 환경변수로 다시 설정합니다.",
+        "2. 본문은 `object_store` 폴더의 `<object>`(sha256) 파일에 있습니다.",
+        "3. `workspace/` 하위 파일은 `scripts/notion_bootstrap_apply.py --dry-run`으로 대상을 먼저 확인합니다.",
+        "4. `global_codex/` 하위 파일은 `--apply-global`을 줄 때만 `~/.codex`에 적용됩니다.",
+        "5. 민감정보(토큰/키)는 별도 환경변수로 다시 설정합니다.",
         "",
         "## 주의",
         "- 이 번들은 자동 복구용 중간 산출물이며, 원본 파일을 즉시 덮어쓰지 않습니다.",
@@ -403,10 +1063,71 @@ def write_bundle(
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Notion 스냅샷에서 bootstrap 번들 추출")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=("pull", "migrate", "gc"),
+        default="pull",
+        help="pull=스냅샷 번들 생성(기본), migrate=기존 번들을 객체 저장소로 이전, gc=참조 없는 객체 삭제",
+    )
     parser.add_argument("--page-id", help="직접 가져올 스냅샷 page_id")
     parser.add_argument("--output-dir", help="번들 출력 폴더(기본: .bootstrap/notion/<ts>)")
+    parser.add_argument(
+        "--discovery",
+        choices=("tree", "search"),
+        default="tree",
+        help="최신 스냅샷 탐색 방식: tree=루트/codex_setting/old 순회, "
+        "search=워크스페이스 전체 /search 정렬 조회(검색 색인 반영 지연이 있을 수 있음)",
+    )
+    parser.add_argument(
+        "--objects-dir",
+        help=f"파일 본문 객체 저장소 폴더(기본: {notion_store.OBJECTS_DIR.relative_to(WORKSPACE_ROOT).as_posix()})",
+    )
+    parser.add_argument(
+        "--bundles-dir",
+        help="migrate/gc가 훑고 pull이 최근 번들과 비교할 번들 상위 폴더"
+        f"(기본: {notion_store.BUNDLES_DIR.relative_to(WORKSPACE_ROOT).as_posix()})",
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        default=[],
+        help="이 경로의 파일만 받음(반복 가능). 원본 경로, workspace/... 번들 경로, 레포 기준 상대 경로 모두 허용",
+    )
+    parser.add_argument(
+        "--glob",
+        action="append",
+        default=[],
+        help="이 glob 패턴에 맞는 파일만 받음(반복 가능, 예: 'docs/*.md'). "
+        "fnmatch 규칙이라 '*'가 '/'도 넘어 하위 폴더까지 맞추며 '**'는 따로 지원하지 않음. "
+        "toggle 레이아웃 스냅샷이면 맞는 파일의 블록만 조회함",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="최근 번들과 같은 스냅샷(page_id/last_edited_time)이어도 다시 받아 새 번들을 만든다",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="migrate/gc에서 실제 이동/삭제 없이 집계만 출력")
     args = parser.parse_args()
 
+    objects_dir = Path(args.objects_dir).resolve() if args.objects_dir else notion_store.OBJECTS_DIR
+    bundles_dir = Path(args.bundles_dir).resolve() if args.bundles_dir else notion_store.BUNDLES_DIR
+    if args.command == "migrate":
+        stats = notion_store.migrate_bundles(bundles_dir, objects_dir, dry_run=args.dry_run)
+        print("BOOTSTRAP_MIGRATE_RESULT=" + ("DRYRUN" if args.dry_run else "SUCCESS"))
+        print(f"BOOTSTRAP_MIGRATE_BUNDLES={stats['bundles']}")
+        print(f"BOOTSTRAP_MIGRATE_FILES={stats['files']}")
+        print(f"BOOTSTRAP_MIGRATE_STORED={stats['stored']}")
+        print(f"BOOTSTRAP_MIGRATE_FREED_BYTES={stats['freed_bytes']}")
+        return 0
+    if args.command == "gc":
+        stats = notion_store.collect_garbage(bundles_dir, objects_dir, dry_run=args.dry_run)
+        print("BOOTSTRAP_GC_RESULT=" + ("DRYRUN" if args.dry_run else "SUCCESS"))
+        print(f"BOOTSTRAP_GC_KEPT={stats['kept']}")
+        print(f"BOOTSTRAP_GC_REMOVED={stats['removed']}")
+        print(f"BOOTSTRAP_GC_FREED_BYTES={stats['freed_bytes']}")
+        return 0
+
     load_token_from_dotenv_if_missing()
     token = os.getenv(TOKEN_ENV, "").strip()
     if not token:
@@ -425,13 +1146,60 @@ def main() -> int:
             source_page_id = args.page_id.strip()
             source_title = "(manual page id)"
         else:
-            root_page_id = find_root_page_id(token)
-            source_page_id, source_title = find_latest_snapshot_page(token, root_page_id)
-        blocks = list_block_children(token, source_page_id)
-        files = parse_snapshot_files(blocks)
-        if not files:
-            raise RuntimeError("스냅샷에서 복구 가능한 파일 본문을 찾지 못했습니다.")
-        write_bundle(files, out_dir, source_page_id, source_title)
+            found = find_latest_snapshot_by_search(token) if args.discovery == "search" else None
+            if found:
+                source_page_id, source_title = found
+            else:
+                root_page_id, settings_page_id, archive_page_id = resolve_snapshot_parents(token)
+                source_page_id, source_title = find_latest_snapshot_page(
+                    token,
+                    root_page_id,
+                    settings_page_id or "",
+                    archive_page_id,
+                )
+        # 최근 번들과 같은 페이지/수정 시각이면 본문을 다시 받지 않는다(페이지 조회 1회).
+        path_filter = PathFilter(args.path, args.glob)
+        wanted = path_filter if path_filter else None
+        last_edited_time = get_page_time(token, source_page_id, "last_edited_time")
+        unchanged = (
+            None
+            if args.force
+            else find_unchanged_bundle(bundles_dir, source_page_id, last_edited_time, path_filter.describe())
+        )
+        if unchanged is not None:
+            print("BOOTSTRAP_RESULT=UNCHANGED")
+            print(f"BOOTSTRAP_SOURCE_PAGE_ID={source_page_id}")
+            print(f"BOOTSTRAP_SOURCE_PAGE_TITLE={source_title}")
+            print(f"BOOTSTRAP_OUTPUT_DIR={unchanged}")
+            print(f"BOOTSTRAP_REQUESTS={int(notion_http.throttle_report()['requests'])}")
+            return 0
+        meta: Dict[str, Dict[str, str]] = {}
+        writer = BundleWriter(objects_dir)
+        try:
+            stream_snapshot_page(token, source_page_id, writer, meta, wanted)
+            if wanted is not None:
+                meta = {path: info for path, info in meta.items() if path in wanted}
+                if not meta:
+                    raise RuntimeError(f"스냅샷에서 경로 필터에 맞는 파일을 찾지 못했습니다: {path_filter.describe()}")
+            if not meta:
+                raise RuntimeError("스냅샷에서 복구 가능한 파일 본문을 찾지 못했습니다.")
+            resolve_file_refs(token, writer, meta)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        statuses = verify_files(writer.written, meta)
+        write_bundle(
+            writer.written,
+            out_dir,
+            source_page_id,
+            source_title,
+            statuses,
+            objects_dir,
+            last_edited_time,
+            path_filter.describe(),
+        )
+        notion_store.register_bundle(out_dir, bundles_dir, objects_dir)
     except Exception as exc:
         print(f"BOOTSTRAP_RESULT=FAILED", file=sys.stderr)
         print(f"BOOTSTRAP_ERROR={exc}", file=sys.stderr)
@@ -441,7 +1209,16 @@ def main() -> int:
     print(f"BOOTSTRAP_SOURCE_PAGE_ID={source_page_id}")
     print(f"BOOTSTRAP_SOURCE_PAGE_TITLE={source_title}")
     print(f"BOOTSTRAP_OUTPUT_DIR={out_dir}")
-    print(f"BOOTSTRAP_FILE_COUNT={len(files)}")
+    print(f"BOOTSTRAP_FILE_COUNT={len(meta)}")
+    for status in ("verified", "mismatch", "omitted", "missing", "unresolved", "unverified"):
+        print(f"BOOTSTRAP_{status.upper()}={sum(1 for v in statuses.values() if v == status)}")
+    for path, status in sorted(statuses.items()):
+        if status in ("mismatch", "unresolved"):
+            print(f"BOOTSTRAP_{status.upper()}_PATH={path}", file=sys.stderr)
+    throttle = notion_http.throttle_report()
+    print(f"BOOTSTRAP_REQUESTS={int(throttle['requests'])}")
+    print(f"BOOTSTRAP_RETRIES={int(throttle['retries'])}")
+    print(f"BOOTSTRAP_THROTTLED_SEC={throttle['throttled_sec']}")
     return 0
 
 
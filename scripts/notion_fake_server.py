@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Notion REST API 로컬 대역(stand-in) 서버.
+
+동기화/복구 스크립트가 쓰는 엔드포인트만 메모리에 흉내 낸다.
+`NOTION_API_BASE_URL=http://127.0.0.1:<port>/v1`로 실제 API 대신 이 서버를 가리키게 해서
+토큰/네트워크 없이 sync -> archive -> pull 흐름을 확인한다(`scripts/notion_smoke_test.py` 참고).
+
+실제 API와 맞춘 제약:
+- children 배열 최대 100개, 요청 본문 최대 500KB(413), rich_text content 최대 2000자
+- file_upload ID는 업로드 후 한 번만 첨부할 수 있다(재첨부 시 validation_error)
+- `--fail-rate`를 주면 그 비율로 429(Retry-After)를 돌려 재시도 경로를 시험한다
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+MAX_BODY_BYTES = 500_000
+MAX_CHILDREN = 100
+MAX_RICH_TEXT_CHARS = 2000
+MAX_NESTING = 2
+
+
+class NotionError(Exception):
+    def __init__(self, status: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+def title_of(page: Dict) -> str:
+    return "".join(t.get("plain_text", "") for t in page["properties"]["title"]["title"])
+
+
+class FakeNotion:
+    """페이지/블록/업로드 상태를 메모리에 들고 라우팅을 처리한다(모든 변경은 lock 안에서)."""
+
+    def __init__(self, base_url: str = "", fail_rate: float = 0.0) -> None:
+        self.base_url = base_url
+        self.fail_rate = fail_rate
+        self.lock = threading.RLock()
+        self.blocks: Dict[str, Dict] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.pages: Dict[str, Dict] = {}
+        self.uploads: Dict[str, Dict] = {}
+        self.stats: Dict[str, object] = {"requests": 0, "by_route": {}}
+
+    # ---- 상태 조작 ----
+    def make_page(self, parent_id: Optional[str], title: str) -> str:
+        pid = str(uuid.uuid4())
+        ts = now()
+        self.pages[pid] = {
+            "object": "page",
+            "id": pid,
+            "created_time": ts,
+            "last_edited_time": ts,
+            "archived": False,
+            "in_trash": False,
+            "parent": {"type": "page_id", "page_id": parent_id} if parent_id else {"type": "workspace", "workspace": True},
+            "properties": {
+                "title": {
+                    "id": "title",
+                    "type": "title",
+                    "title": [{"type": "text", "text": {"content": title}, "plain_text": title}],
+                }
+            },
+            "url": f"https://www.notion.so/{pid.replace('-', '')}",
+        }
+        self.blocks[pid] = {
+            "object": "block",
+            "id": pid,
+            "type": "child_page",
+            "child_page": {"title": title},
+            "created_time": ts,
+            "last_edited_time": ts,
+            "has_children": False,
+            "archived": False,
+            "parent": {"type": "page_id", "page_id": parent_id},
+        }
+        self.children[pid] = []
+        if parent_id:
+            self.children.setdefault(parent_id, []).append(pid)
+        return pid
+
+    def touch(self, block_id: str) -> None:
+        pid: Optional[str] = block_id
+        while pid and pid not in self.pages:
+            parent = self.blocks.get(pid, {}).get("parent", {})
+            pid = parent.get("block_id") or parent.get("page_id")
+        if pid in self.pages:
+            self.pages[pid]["last_edited_time"] = now()
+
+    def visible_children(self, block_id: str) -> List[str]:
+        return [c for c in self.children.get(block_id, []) if not self.blocks[c].get("archived")]
+
+    def find_pages(self, title: str) -> List[Dict]:
+        return [p for p in self.pages.values() if title_of(p) == title and not p["archived"]]
+
+    def _rich_text(self, rich: object) -> List[Dict]:
+        out = []
+        for item in rich or []:  # type: ignore[union-attr]
+            item = dict(item)
+            content = item.get("text", {}).get("content", "")
+            if len(content) > MAX_RICH_TEXT_CHARS:
+                raise NotionError(400, "validation_error", f"rich_text content length should be ≤ {MAX_RICH_TEXT_CHARS}")
+            item["plain_text"] = content
+            out.append(item)
+        if len(out) > 100:
+            raise NotionError(400, "validation_error", "rich_text length should be ≤ 100")
+        return out
+
+    def add_block(self, parent_id: str, spec: Dict, depth: int = 0, after: Optional[str] = None) -> str:
+        btype = spec.get("type")
+        if not isinstance(btype, str) or btype == "child_page" or not isinstance(spec.get(btype), dict):
+            raise NotionError(400, "validation_error", f"unsupported block type: {btype}")
+        payload = dict(spec[btype])
+        kids = payload.pop("children", None) or spec.get("children")
+        if "rich_text" in payload:
+            payload["rich_text"] = self._rich_text(payload["rich_text"])
+        if btype == "file" and payload.get("type") == "file_upload":
+            upload_id = (payload.get("file_upload") or {}).get("id")
+            upload = self.uploads.get(upload_id or "")
+            if not upload or upload["status"] != "uploaded":
+                raise NotionError(400, "validation_error", f"file_upload {upload_id} is not attachable")
+            upload["status"] = "attached"
+            payload = {
+                "type": "file",
+                "file": {"url": f"{self.base_url}/_download/{upload_id}", "expiry_time": now()},
+                "name": payload.get("name") or upload["filename"],
+                "caption": [],
+            }
+        bid = str(uuid.uuid4())
+        ts = now()
+        self.blocks[bid] = {
+            "object": "block",
+            "id": bid,
+            "type": btype,
+            btype: payload,
+            "created_time": ts,
+            "last_edited_time": ts,
+            "has_children": False,
+            "archived": False,
+            "parent": {"type": "page_id", "page_id": parent_id}
+            if parent_id in self.pages
+            else {"type": "block_id", "block_id": parent_id},
+        }
+        self.children[bid] = []
+        siblings = self.children.setdefault(parent_id, [])
+        if after and after in siblings:
+            siblings.insert(siblings.index(after) + 1, bid)
+        else:
+            siblings.append(bid)
+        if parent_id in self.blocks:
+            self.blocks[parent_id]["has_children"] = True
+        if kids:
+            if depth >= MAX_NESTING:
+                raise NotionError(400, "validation_error", "children nesting too deep")
+            if len(kids) > MAX_CHILDREN:
+                raise NotionError(400, "validation_error", f"body.children.length should be ≤ {MAX_CHILDREN}")
+            for kid in kids:
+                self.add_block(bid, kid, depth + 1)
+        return bid
+
+    # ---- 라우팅 ----
+    def route(self, method: str, path: str, query: Dict, payload: Dict, raw: bytes, ctype: str) -> Tuple[int, Dict]:
+        m = re.fullmatch(r"/blocks/([^/]+)/children", path)
+        if m:
+            bid = m.group(1)
+            if bid not in self.blocks:
+                raise KeyError(bid)
+            if method == "GET":
+                kids = self.visible_children(bid)
+                size = int(query.get("page_size", ["100"])[0])
+                start = int(query.get("start_cursor", ["0"])[0])
+                more = start + size < len(kids)
+                return 200, {
+                    "object": "list",
+                    "results": [self.blocks[k] for k in kids[start : start + size]],
+                    "has_more": more,
+                    "next_cursor": str(start + size) if more else None,
+                }
+            if method == "PATCH":
+                kids = payload.get("children") or []
+                if len(kids) > MAX_CHILDREN:
+                    raise NotionError(400, "validation_error", f"body.children.length should be ≤ {MAX_CHILDREN}")
+                after = payload.get("after")
+                made = []
+                for kid in kids:
+                    nid = self.add_block(bid, kid, 0, after)
+                    after = nid if after else None
+                    made.append(nid)
+                self.touch(bid)
+                return 200, {"object": "list", "results": [self.blocks[k] for k in made]}
+        m = re.fullmatch(r"/blocks/([^/]+)", path)
+        if m:
+            blk = self.blocks[m.group(1)]
+            if method == "GET":
+                return 200, blk
+            if method == "DELETE":
+                blk["archived"] = True
+                self.touch(blk["id"])
+                return 200, blk
+            if method == "PATCH":
+                btype = blk["type"]
+                if btype in payload:
+                    update = dict(payload[btype])
+                    if "rich_text" in update:
+                        update["rich_text"] = self._rich_text(update["rich_text"])
+                    blk[btype].update(update)
+                self.touch(blk["id"])
+                return 200, blk
+        if path == "/pages" and method == "POST":
+            parent = payload["parent"]["page_id"]
+            if parent not in self.pages:
+                raise KeyError(parent)
+            title = "".join(t["text"]["content"] for t in payload["properties"]["title"]["title"])
+            kids = payload.get("children") or []
+            if len(kids) > MAX_CHILDREN:
+                raise NotionError(400, "validation_error", f"body.children.length should be ≤ {MAX_CHILDREN}")
+            pid = self.make_page(parent, title)
+            for kid in kids:
+                self.add_block(pid, kid)
+            return 200, self.pages[pid]
+        m = re.fullmatch(r"/pages/([^/]+)", path)
+        if m:
+            page = self.pages[m.group(1)]
+            if method == "GET":
+                return 200, page
+            if method == "PATCH":
+                if "archived" in payload:
+                    page["archived"] = page["in_trash"] = bool(payload["archived"])
+                    self.blocks[page["id"]]["archived"] = bool(payload["archived"])
+                return 200, page
+        if path == "/search" and method == "POST":
+            query_text = str(payload.get("query", "")).lower()
+            results = [p for p in self.pages.values() if query_text in title_of(p).lower() and not p["archived"]]
+            sort = payload.get("sort")
+            if sort:
+                results.sort(key=lambda p: p[sort["timestamp"]], reverse=sort.get("direction") == "descending")
+            size = int(payload.get("page_size", 100))
+            start = int(payload.get("start_cursor") or 0)
+            more = start + size < len(results)
+            return 200, {
+                "object": "list",
+                "results": results[start : start + size],
+                "has_more": more,
+                "next_cursor": str(start + size) if more else None,
+            }
+        if path == "/file_uploads" and method == "POST":
+            fid = str(uuid.uuid4())
+            self.uploads[fid] = {"status": "pending", "data": b"", "filename": payload.get("filename", "file")}
+            return 200, {"object": "file_upload", "id": fid, "status": "pending"}
+        m = re.fullmatch(r"/file_uploads/([^/]+)/send", path)
+        if m and method == "POST":
+            upload = self.uploads[m.group(1)]
+            boundary = ctype.split("boundary=", 1)[1].strip('"').encode()
+            for part in raw.split(b"--" + boundary):
+                if b'name="file"' in part:
+                    _, _, data = part.partition(b"\r\n\r\n")
+                    upload["data"] = data[:-2] if data.endswith(b"\r\n") else data
+            upload["status"] = "uploaded"
+            return 200, {"object": "file_upload", "id": m.group(1), "status": "uploaded"}
+        raise NotionError(404, "invalid_request_url", f"no route {method} {path}")
+
+
+def make_handler(state: FakeNotion) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+        def _send(self, status: int, obj: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+            self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+        def _handle(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            url = urlparse(self.path)
+            path = url.path[3:] if url.path.startswith("/v1") else url.path
+            with state.lock:
+                state.stats["requests"] = int(state.stats["requests"]) + 1  # type: ignore[arg-type]
+                route = method + " " + re.sub(r"[0-9a-f-]{36}", "{id}", path)
+                by_route = state.stats["by_route"]
+                by_route[route] = by_route.get(route, 0) + 1  # type: ignore[union-attr,index]
+            if path.startswith("/_download/"):
+                upload = state.uploads.get(path.rsplit("/", 1)[1])
+                if upload is None:
+                    return self._error(404, "object_not_found", "no such upload")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(upload["data"])))
+                self.end_headers()
+                self.wfile.write(upload["data"])
+                return
+            if state.fail_rate and random.random() < state.fail_rate:
+                return self._error(429, "rate_limited", "rate limited", {"Retry-After": "0.2"})
+            if len(raw) > MAX_BODY_BYTES:
+                return self._error(413, "validation_error", "Request body too large.")
+            ctype = self.headers.get("Content-Type", "")
+            payload = json.loads(raw) if raw and ctype.startswith("application/json") else {}
+            try:
+                with state.lock:
+                    status, obj = state.route(method, path, parse_qs(url.query), payload, raw, ctype)
+            except KeyError as exc:
+                return self._error(404, "object_not_found", f"Could not find {exc}")
+            except NotionError as exc:
+                return self._error(exc.status, exc.code, exc.message)
+            self._send(status, obj)
+
+        def do_GET(self) -> None:
+            self._handle("GET")
+
+        def do_POST(self) -> None:
+            self._handle("POST")
+
+        def do_PATCH(self) -> None:
+            self._handle("PATCH")
+
+        def do_DELETE(self) -> None:
+            self._handle("DELETE")
+
+    return Handler
+
+
+def start_server(
+    port: int = 0,
+    root_title: str = "Notion MCP Server",
+    fail_rate: float = 0.0,
+) -> Tuple[ThreadingHTTPServer, FakeNotion]:
+    # port=0이면 빈 포트를 고른다. 서버는 데몬 스레드에서 돌고, 루트 페이지 하나를 미리 만들어 둔다.
+    state = FakeNotion(fail_rate=fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    state.make_page(None, root_title)
+    threading.Thread(target=server.serve_forever, name="notion-fake-server", daemon=True).start()
+    return server, state
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Notion REST API 로컬 대역 서버")
+    parser.add_argument("--port", type=int, default=8765, help="수신 포트(기본: 8765)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="이 비율로 429 응답을 섞음(0~1)")
+    args = parser.parse_args()
+
+    server, state = start_server(args.port, fail_rate=args.fail_rate)
+    print(f"NOTION_API_BASE_URL={state.base_url}/v1", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Notion REST API 공용 HTTP 클라이언트.
+
+`notion_sync_settings.py` / `notion_bootstrap_pull.py`가 함께 사용한다.
+
+- keep-alive `http.client.HTTPSConnection` 풀을 재사용해 요청마다 TCP/TLS 핸드셰이크를 반복하지 않는다.
+- 재사용한 연결이 서버 쪽에서 끊겨 있으면 새 연결로 한 번 더 보낸다.
+- 토큰 버킷으로 평균 요청 속도를 Notion 제한(~3 req/s)에 맞추고,
+  429는 `Retry-After`를 존중해 재시도한다. 5xx/네트워크 오류는 멱등 요청만 재시도한다.
+- 파일 업로드(`multipart/form-data`) 전송과, 인증 없이 받는 첨부 파일 다운로드 스트림을 제공한다.
+- `AsyncNotionClient`는 같은 풀/토큰 버킷과 프로세스 공용 워커 풀을 공유하면서 동시 실행 수를 제한한 asyncio 인터페이스를 제공한다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+
+NOTION_API_BASE = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+API_BASE_ENV = "NOTION_API_BASE_URL"
+RATE_LIMIT_ENV = "NOTION_RATE_LIMIT_PER_SEC"
+CONCURRENCY_ENV = "NOTION_CONCURRENCY"
+
+POOL_SIZE = 4
+REQUEST_TIMEOUT = 45
+DEFAULT_CONCURRENCY = 4
+
+RATE_LIMIT_PER_SEC = 3.0
+RATE_LIMIT_BURST = 3
+MAX_RETRIES = 5
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 30.0
+RETRYABLE_STATUS = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "DELETE")
+
+# 재사용한 keep-alive 연결이 idle timeout 등으로 닫혔을 때 발생하는 예외들
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = max(rate, 0.01)
+        self.capacity = float(max(1, burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """토큰 하나를 얻을 때까지 대기하고, 대기한 시간(초)을 돌려준다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                else:
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        # Retry-After 동안에는 모든 요청을 함께 멈춘다.
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        seconds = float(value.strip())
+    except ValueError:
+        return None
+    return max(0.0, seconds)
+
+
+def backoff_delay(attempt: int) -> float:
+    # full jitter 지수 백오프
+    return random.uniform(0.0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)))
+
+
+def default_rate_limit() -> float:
+    raw = os.getenv(RATE_LIMIT_ENV, "").strip()
+    if not raw:
+        return RATE_LIMIT_PER_SEC
+    try:
+        value = float(raw)
+    except ValueError:
+        return RATE_LIMIT_PER_SEC
+    return value if value > 0 else RATE_LIMIT_PER_SEC
+
+
+def default_concurrency() -> int:
+    raw = os.getenv(CONCURRENCY_ENV, "").strip()
+    try:
+        value = int(raw) if raw else DEFAULT_CONCURRENCY
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+    return value if value > 0 else DEFAULT_CONCURRENCY
+
+
+class NotionClient:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_size: int = POOL_SIZE,
+        timeout: float = REQUEST_TIMEOUT,
+        rate_limit: Optional[float] = None,
+        burst: int = RATE_LIMIT_BURST,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        base = (base_url or os.getenv(API_BASE_ENV, "").strip() or NOTION_API_BASE).rstrip("/")
+        parsed = urllib.parse.urlsplit(base)
+        if parsed.scheme not in ("https", "http") or not parsed.hostname:
+            raise RuntimeError(f"Notion API 주소 형식이 올바르지 않습니다: {base}")
+        self.base_url = base
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path_prefix = parsed.path.rstrip("/")
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.bucket = TokenBucket(rate_limit if rate_limit else default_rate_limit(), burst)
+        self.max_retries = max(0, max_retries)
+        self.stats: Dict[str, float] = {
+            "requests": 0,
+            "retries": 0,
+            "throttled_sec": 0.0,
+        }
+
+    def _add_stat(self, key: str, value: float) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _headers(self, token: str, content_type: str = "application/json") -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token}",
+            "Notion-Version": NOTION_VERSION,
+            "Content-Type": content_type,
+        }
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        token: str,
+        payload: Optional[Dict] = None,
+        idempotent: Optional[bool] = None,
+    ) -> Tuple[int, str]:
+        data = None
+        if payload is not None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return self.request_raw(method, path, token, data, "application/json", idempotent)
+
+    def request_multipart(
+        self,
+        path: str,
+        token: str,
+        field: str,
+        filename: str,
+        data: bytes,
+        content_type: str,
+    ) -> Tuple[int, str]:
+        body, form_type = encode_multipart(field, filename, data, content_type)
+        return self.request_raw("POST", path, token, body, form_type, idempotent=False)
+
+    def request_raw(
+        self,
+        method: str,
+        path: str,
+        token: str,
+        data: Optional[bytes],
+        content_type: str,
+        idempotent: Optional[bool] = None,
+    ) -> Tuple[int, str]:
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        headers = self._headers(token, content_type)
+        attempt = 0
+        while True:
+            self._add_stat("throttled_sec", self.bucket.acquire())
+            self._add_stat("requests", 1)
+            try:
+                status, resp_headers, raw = self._send(method, self.path_prefix + path, headers, data)
+            except (OSError, http.client.HTTPException):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                # 429는 서버가 처리 전에 거절한 것이므로 비멱등 요청도 재시도한다.
+                retryable = status == 429 or (idempotent and status in RETRYABLE_STATUS)
+                if not retryable or attempt >= self.max_retries:
+                    return status, raw.decode("utf-8", errors="replace")
+                delay = parse_retry_after(resp_headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                else:
+                    delay += random.uniform(0.0, BACKOFF_BASE_SEC)
+                if status == 429:
+                    self.bucket.pause(delay)
+
+            attempt += 1
+            self._add_stat("retries", 1)
+            self._add_stat("throttled_sec", delay)
+            time.sleep(delay)
+
+    def _send(
+        self,
+        method: str,
+        url_path: str,
+        headers: Dict[str, str],
+        data: Optional[bytes],
+    ) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        while True:
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, url_path, body=data, headers=headers)
+                resp = conn.getresponse()
+                # keep-alive 재사용을 위해 본문은 항상 끝까지 읽는다.
+                raw = resp.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return resp.status, resp.headers, raw
+
+
+def encode_multipart(field: str, filename: str, data: bytes, content_type: str) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    safe_name = filename.replace('"', "_").replace("\r", "_").replace("\n", "_")
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{safe_name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+    return head + data + tail, f"multipart/form-data; boundary={boundary}"
+
+
+_default_client: Optional[NotionClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> NotionClient:
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = NotionClient()
+        return _default_client
+
+
+def request(
+    method: str,
+    path: str,
+    token: str,
+    payload: Optional[Dict] = None,
+    idempotent: Optional[bool] = None,
+) -> Tuple[int, str]:
+    return get_client().request(method, path, token, payload, idempotent)
+
+
+def request_multipart(
+    path: str,
+    token: str,
+    field: str,
+    filename: str,
+    data: bytes,
+    content_type: str,
+) -> Tuple[int, str]:
+    return get_client().request_multipart(path, token, field, filename, data, content_type)
+
+
+def open_download(url: str, timeout: float = REQUEST_TIMEOUT) -> Any:
+    # Notion 첨부 파일 URL은 서명된 임시 주소이므로 인증 헤더 없이 받는다(응답은 스트림으로 읽는다).
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("https", "http"):
+        raise RuntimeError(f"다운로드 주소 형식이 올바르지 않습니다: {url[:120]}")
+    get_client()._add_stat("requests", 1)
+    return urllib.request.urlopen(url, timeout=timeout)
+
+
+def throttle_report() -> Dict[str, float]:
+    stats = dict(get_client().stats)
+    stats["throttled_sec"] = round(stats["throttled_sec"], 3)
+    return stats
+
+
+_shared_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def shared_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # 프로세스 전체가 워커 풀 하나를 공유해 동시 실행 수가 호출 횟수/중첩 깊이와 무관하게 고정된다.
+    global _shared_executor
+    with _executor_lock:
+        if _shared_executor is None:
+            _shared_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=default_concurrency(),
+                thread_name_prefix="notion",
+            )
+        return _shared_executor
+
+
+def in_worker() -> bool:
+    return getattr(_worker_state, "active", False)
+
+
+def _run_as_worker(fn: Callable[[], T]) -> T:
+    _worker_state.active = True
+    try:
+        return fn()
+    finally:
+        _worker_state.active = False
+
+
+class AsyncNotionClient:
+    """
+    동기 풀 클라이언트를 공유 워커 풀(`shared_executor`)에서 실행하는 asyncio 래퍼.
+
+    요청 속도는 공유 토큰 버킷이, 동시에 진행 중인 작업 수는 공유 풀 크기(`NOTION_CONCURRENCY`)와
+    `concurrency` 중 작은 쪽이 제한한다. 여러 스레드가 동시에 써도 전체 워커 수는 늘지 않는다.
+    """
+
+    def __init__(self, client: Optional[NotionClient] = None, concurrency: Optional[int] = None) -> None:
+        self.client = client or get_client()
+        self.concurrency = max(1, concurrency or default_concurrency())
+        self._executor = shared_executor()
+        # 동시 요청 수만큼 keep-alive 연결을 풀에 남겨 둔다.
+        self.client.pool_size = max(self.client.pool_size, min(self.concurrency, default_concurrency()))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _limit(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # fn 안에서 부른 map_concurrently는 새 워커를 잡지 않고 이 워커에서 차례로 실행된다(`in_worker`).
+        async with self._limit():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                _run_as_worker,
+                functools.partial(fn, *args, **kwargs),
+            )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        token: str,
+        payload: Optional[Dict] = None,
+        idempotent: Optional[bool] = None,
+    ) -> Tuple[int, str]:
+        return await self.call(self.client.request, method, path, token, payload, idempotent)
+
+    async def map(self, fn: Callable[[Any], T], items: Iterable[Any]) -> List[T]:
+        return list(await asyncio.gather(*(self.call(fn, item) for item in items)))
+
+
+def prefetch(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    items를 백그라운드 스레드에서 최대 maxsize개까지 미리 만들어 두고 순서대로 내보낸다.
+
+    생산(파일 읽기/블록 변환, 블록 목록 조회)이 소비(업로드, 파일 쓰기)와 겹쳐 진행되고,
+    대기열 크기로 메모리가 제한된다.
+    """
+    pending: "queue.Queue[Tuple[str, object]]" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    # 공유 워커 안에서 만든 생산 스레드는 그 워커의 슬롯을 이어 쓴다(풀 빈자리를 기다리며 교착하지 않게).
+    nested = in_worker()
+
+    def put(kind: str, value: object) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put((kind, value), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        _worker_state.active = nested
+        try:
+            for item in items:
+                if not put("item", item):
+                    return
+        except BaseException as exc:
+            put("error", exc)
+            return
+        put("done", None)
+
+    worker = threading.Thread(target=produce, name="notion-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, value = pending.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value  # type: ignore[misc]
+            yield value  # type: ignore[misc]
+    finally:
+        stop.set()
+        worker.join()
+
+
+def run_async(factory: Callable[[AsyncNotionClient], Awaitable[T]], concurrency: Optional[int] = None) -> T:
+    """동기 코드에서 AsyncNotionClient를 열어 코루틴 하나를 끝까지 실행한다."""
+    if in_worker():
+        # 공유 풀 워커가 같은 풀의 빈자리를 기다리면 풀이 가득 찼을 때 서로를 기다리며 멈춘다.
+        raise RuntimeError("공유 워커 안에서는 run_async를 중첩 실행할 수 없습니다(map_concurrently 사용).")
+    return asyncio.run(factory(AsyncNotionClient(concurrency=concurrency)))
+
+
+def map_concurrently(fn: Callable[[Any], T], items: Iterable[Any], concurrency: Optional[int] = None) -> List[T]:
+    """
+    blocking 함수 fn을 items 각각에 대해 동시 실행 수 제한 아래 병렬로 실행한다(결과 순서 유지).
+
+    이미 공유 워커 안에서 불린 중첩 호출(예: 하위 트리 조회 안의 BFS)은 바깥 호출이 잡은 슬롯 안에서
+    차례로 실행되므로 전체 동시 실행 수는 바깥 제한을 넘지 않는다.
+    """
+    materialized = list(items)
+    if len(materialized) <= 1 or in_worker():
+        return [fn(item) for item in materialized]
+    return run_async(lambda aclient: aclient.map(fn, materialized), concurrency)
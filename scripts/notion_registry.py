@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Notion 페이지 ID 로컬 레지스트리.
+
+루트/설정/보관(old) 페이지 ID를 토큰 지문별로 `.bootstrap/state/notion_page_ids.json`에 저장해
+매 실행마다 `/search`와 하위 목록 조회로 ID를 다시 찾지 않도록 한다.
+저장된 ID는 사용할 때 `GET /pages/{id}` 한 번으로 확인하고, 404(또는 휴지통 이동)일 때만 재탐색한다.
+
+증분 스냅샷용 파일 해시 인덱스(`notion_sync_index.json`)도 같은 상태 폴더에 토큰 지문별로 저장한다.
+같은 파일에 아직 보관(old) 색인에 기록되지 않은 스냅샷 페이지별 파일 해시도 함께 둔다.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import notion_http
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = WORKSPACE_ROOT / ".bootstrap" / "state"
+REGISTRY_PATH = STATE_DIR / "notion_page_ids.json"
+SYNC_INDEX_PATH = STATE_DIR / "notion_sync_index.json"
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_page_id(page_id: str) -> str:
+    return page_id.replace("-", "").strip().lower()
+
+
+def _read_json(path: Path) -> Dict:
+    try:
+        obj = json.loads(path.read_text(encoding="utf-8"))
+        return obj if isinstance(obj, dict) else {}
+    except Exception:
+        return {}
+
+
+class PageRegistry:
+    def __init__(self, path: Path, fingerprint: str, entries: Dict[str, str]) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = entries
+
+    @classmethod
+    def load(cls, token: str, path: Path = REGISTRY_PATH) -> "PageRegistry":
+        fingerprint = token_fingerprint(token)
+        stored = _read_json(path).get(fingerprint)
+        entries: Dict[str, str] = {}
+        if isinstance(stored, dict):
+            for key, value in stored.items():
+                if isinstance(value, str) and value:
+                    entries[key] = value
+        return cls(path, fingerprint, entries)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def update(self, **ids: str) -> None:
+        for key, value in ids.items():
+            if value:
+                self.entries[key] = value
+
+    def forget(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def save(self) -> None:
+        data = _read_json(self.path)
+        entries = dict(self.entries)
+        entries["updated_at_utc"] = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ")
+        data[self.fingerprint] = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def load_sync_index(token: str, path: Path = SYNC_INDEX_PATH) -> Dict[str, Dict[str, str]]:
+    stored = _read_json(path).get(token_fingerprint(token))
+    files = stored.get("files") if isinstance(stored, dict) else None
+    if not isinstance(files, dict):
+        return {}
+    return {
+        key: value
+        for key, value in files.items()
+        if isinstance(key, str) and isinstance(value, dict)
+    }
+
+
+def _save_sync_entry(token: str, path: Path, **values: object) -> None:
+    data = _read_json(path)
+    fingerprint = token_fingerprint(token)
+    entry = data.get(fingerprint)
+    if not isinstance(entry, dict):
+        entry = {}
+    entry.update(values)
+    entry["updated_at_utc"] = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ")
+    data[fingerprint] = entry
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def save_sync_index(token: str, files: Dict[str, Dict[str, str]], path: Path = SYNC_INDEX_PATH) -> None:
+    _save_sync_entry(token, path, files=files)
+
+
+def load_snapshot_hashes(token: str, path: Path = SYNC_INDEX_PATH) -> Dict[str, Dict[str, str]]:
+    stored = _read_json(path).get(token_fingerprint(token))
+    snapshots = stored.get("snapshots") if isinstance(stored, dict) else None
+    if not isinstance(snapshots, dict):
+        return {}
+    return {
+        normalize_page_id(key): value
+        for key, value in snapshots.items()
+        if isinstance(key, str) and isinstance(value, dict)
+    }
+
+
+def save_snapshot_hashes(
+    token: str,
+    snapshots: Dict[str, Dict[str, str]],
+    path: Path = SYNC_INDEX_PATH,
+) -> None:
+    _save_sync_entry(token, path, snapshots=snapshots)
+
+
+def page_is_live(token: str, page_id: str, parent_id: Optional[str] = None) -> bool:
+    code, body = notion_http.request("GET", f"/pages/{page_id}", token)
+    if code == 404:
+        return False
+    if not 200 <= code < 300:
+        raise RuntimeError(f"저장된 페이지 확인 실패: HTTP {code} / {body[:300]}")
+    try:
+        page = json.loads(body)
+    except Exception:
+        page = None
+    if not isinstance(page, dict):
+        return False
+    if page.get("archived") or page.get("in_trash"):
+        return False
+    if parent_id:
+        parent = page.get("parent")
+        actual = parent.get("page_id") if isinstance(parent, dict) else None
+        if not isinstance(actual, str) or normalize_page_id(actual) != normalize_page_id(parent_id):
+            return False
+    return True
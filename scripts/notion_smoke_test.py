@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Notion 동기화/복구 스크립트 스모크 테스트(로컬 대역 서버 사용, 토큰/네트워크 불필요).
+
+임시 workspace에 `scripts/`를 복사하고 `scripts/notion_fake_server.py`를 띄운 뒤
+sync -> archive -> pull 흐름을 레이아웃별로 실행해 결과 출력(SYNC_*/BOOTSTRAP_*)을 확인한다.
+실제 workspace의 `.bootstrap/`과 `~/.codex`는 건드리지 않는다(HOME도 임시 폴더로 바꾼다).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import notion_fake_server
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+SNAPSHOT_TITLE_PREFIX = "Codex Settings Snapshot"
+
+
+class SmokeFailure(RuntimeError):
+    pass
+
+
+class SmokeRun:
+    def __init__(self, workspace: Path, base_url: str, state: notion_fake_server.FakeNotion) -> None:
+        self.workspace = workspace
+        self.state = state
+        self.env = dict(os.environ)
+        self.env.update(
+            NOTION_API_BASE_URL=f"{base_url}/v1",
+            NOTION_MCP_TOKEN="smoke-test-token",
+            NOTION_RATE_LIMIT_PER_SEC="50",
+            HOME=str(workspace / "home"),
+            USERPROFILE=str(workspace / "home"),
+        )
+        self.env.pop("NOTION_SETTINGS_ROOT_PAGE_ID", None)
+
+    def run(self, script: str, *args: str) -> Dict[str, str]:
+        proc = subprocess.run(
+            [sys.executable, str(self.workspace / "scripts" / script), *args],
+            cwd=self.workspace,
+            env=self.env,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+        )
+        out: Dict[str, str] = {}
+        for line in (proc.stdout + proc.stderr).splitlines():
+            key, sep, value = line.partition("=")
+            if sep and key.isupper():
+                out.setdefault(key, value)
+        if proc.returncode != 0:
+            raise SmokeFailure(f"{script} {' '.join(args)} 실패(exit {proc.returncode}): {proc.stderr.strip()[-500:]}")
+        return out
+
+    def pull(self, name: str, *args: str) -> Dict[str, str]:
+        bundles = self.workspace / ".bootstrap" / "notion"
+        return self.run("notion_bootstrap_pull.py", "--output-dir", str(bundles / name), "--force", *args)
+
+    def archived_copy(self, source_title: str) -> str:
+        # copy 보관 방식은 old 아래에 같은 제목의 새 페이지를 만든다.
+        with self.state.lock:
+            old = [p for p in self.state.find_pages("old")]
+            for page in self.state.find_pages(source_title):
+                if old and page["parent"].get("page_id") == old[0]["id"]:
+                    return page["id"]
+        raise SmokeFailure(f"old 아래에서 보관 사본을 찾지 못했습니다: {source_title}")
+
+    def page_trashed(self, page_id: str) -> bool:
+        with self.state.lock:
+            return bool(self.state.pages[page_id]["archived"])
+
+    def page_title(self, page_id: str) -> str:
+        with self.state.lock:
+            return notion_fake_server.title_of(self.state.pages[page_id])
+
+
+def expect(out: Dict[str, str], key: str, check: Callable[[str], bool], what: str) -> None:
+    value = out.get(key, "")
+    if not check(value):
+        raise SmokeFailure(f"{key}={value!r} (기대: {what})")
+
+
+def same_page(a: str, b: str) -> bool:
+    return a.replace("-", "").lower() == b.replace("-", "").lower()
+
+
+def expect_verified(out: Dict[str, str]) -> None:
+    expect(out, "BOOTSTRAP_RESULT", lambda v: v == "SUCCESS", "SUCCESS")
+    expect(out, "BOOTSTRAP_MISMATCH", lambda v: v == "0", "0")
+    expect(out, "BOOTSTRAP_UNRESOLVED", lambda v: v == "0", "0")
+    expect(out, "BOOTSTRAP_VERIFIED", lambda v: v.isdigit() and int(v) > 0, "> 0")
+
+
+def scenario_tar_archive(smoke: SmokeRun) -> None:
+    tar = smoke.run("notion_sync_settings.py", "--layout", "tar")
+    tar_title = smoke.page_title(tar["SYNC_PAGE_ID"])
+    # 다음 실행이 tar 스냅샷을 old로 복사한다(첨부는 다시 받아 새 업로드로 붙인다).
+    blocks = smoke.run("notion_sync_settings.py")
+    expect(blocks, "SYNC_ARCHIVED_TO_OLD", lambda v: v == "1", "1")
+    expect(blocks, "SYNC_MOVE_FAILED", lambda v: v == "0", "0")
+    expect_verified(smoke.pull("tar-archived", "--page-id", smoke.archived_copy(tar_title)))
+    expect_verified(smoke.pull("blocks"))
+
+
+def scenario_incremental(smoke: SmokeRun) -> None:
+    smoke.run("notion_sync_settings.py", "--pack-code")
+    inc = smoke.run("notion_sync_settings.py", "--incremental", "--compress", "zlib", "--compress-min-chars", "100")
+    expect(inc, "SYNC_FILES_REFERENCED", lambda v: v.isdigit() and int(v) > 0, "> 0")
+    expect_verified(smoke.pull("incremental"))
+
+
+def scenario_prune_keeps_refs(smoke: SmokeRun) -> None:
+    # B는 A의 본문을 참조한다. 보존 정책이 A만 정리 대상으로 골라도 남는 B가 참조하므로 A는 남아야 한다.
+    # (대역 서버는 휴지통 페이지도 읽어 주므로 pull 성공만으로는 부족해 휴지통 여부를 직접 본다)
+    base = smoke.run("notion_sync_settings.py", "--pack-code")
+    time.sleep(1.1)
+    ref = smoke.run("notion_sync_settings.py", "--pack-code", "--incremental", "--archive-strategy", "reference")
+    expect(ref, "SYNC_FILES_REFERENCED", lambda v: v.isdigit() and int(v) > 0, "> 0")
+    time.sleep(1.1)
+    smoke.run("notion_sync_settings.py", "--pack-code", "--archive-strategy", "reference", "--keep-last", "1")
+    if smoke.page_trashed(base["SYNC_PAGE_ID"]):
+        raise SmokeFailure("남은 증분 보관본이 참조하는 원본 페이지가 정리됐습니다.")
+    expect_verified(smoke.pull("pruned-ref", "--page-id", ref["SYNC_PAGE_ID"]))
+
+
+def scenario_toggle_path(smoke: SmokeRun) -> None:
+    smoke.run("notion_sync_settings.py", "--layout", "toggle")
+    out = smoke.pull("toggle-one", "--path", "scripts/notion_http.py")
+    expect_verified(out)
+    expect(out, "BOOTSTRAP_FILE_COUNT", lambda v: v == "1", "1")
+
+
+def scenario_in_place_search(smoke: SmokeRun) -> None:
+    smoke.run("notion_sync_settings.py", "--in-place")
+    out = smoke.pull("in-place", "--discovery", "search")
+    expect_verified(out)
+    expect(out, "BOOTSTRAP_SOURCE_PAGE_TITLE", lambda v: v == f"{SNAPSHOT_TITLE_PREFIX} (current)", "현재 페이지")
+    # 이어서 일반 동기화를 하면 현재 페이지는 old로 복사되지 않고, search는 새 타임스탬프 스냅샷을 고른다.
+    # (대역 서버 수정 시각은 초 단위라 같은 초에 겹치지 않게 한 번 쉰다)
+    time.sleep(1.1)
+    blocks = smoke.run("notion_sync_settings.py")
+    expect(blocks, "SYNC_ARCHIVED_TO_OLD", lambda v: v == "0", "0")
+    out = smoke.pull("after-blocks", "--discovery", "search")
+    expect_verified(out)
+    expect(out, "BOOTSTRAP_SOURCE_PAGE_ID", lambda v: same_page(v, blocks["SYNC_PAGE_ID"]), "새 스냅샷")
+
+
+def scenario_in_place_reference(smoke: SmokeRun) -> None:
+    # 참조 방식 보관은 이전 타임스탬프 원본을 settings에 남기므로, 트리 탐색이 더 최근에 갱신된 현재 페이지를 골라야 한다.
+    smoke.run("notion_sync_settings.py")
+    time.sleep(1.1)
+    current = smoke.run("notion_sync_settings.py", "--in-place", "--archive-strategy", "reference")
+    out = smoke.pull("in-place-tree")
+    expect_verified(out)
+    expect(out, "BOOTSTRAP_SOURCE_PAGE_ID", lambda v: same_page(v, current["SYNC_PAGE_ID"]), "현재 페이지")
+
+
+SCENARIOS: List[Tuple[str, Callable[[SmokeRun], None]]] = [
+    ("tar_archive", scenario_tar_archive),
+    ("incremental", scenario_incremental),
+    ("prune_keeps_refs", scenario_prune_keeps_refs),
+    ("toggle_path", scenario_toggle_path),
+    ("in_place_search", scenario_in_place_search),
+    ("in_place_reference", scenario_in_place_reference),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Notion 동기화/복구 스모크 테스트(로컬 대역 서버)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="대역 서버가 429를 섞는 비율(재시도 경로 확인용)")
+    parser.add_argument("--keep", action="store_true", help="임시 workspace를 지우지 않고 경로를 출력")
+    args = parser.parse_args()
+
+    failed = 0
+    for name, scenario in SCENARIOS:
+        # 시나리오마다 새 서버/workspace를 써서 서로의 페이지·상태가 섞이지 않게 한다.
+        workspace = Path(tempfile.mkdtemp(prefix="notion-smoke-"))
+        shutil.copytree(SCRIPTS_DIR, workspace / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+        (workspace / "home").mkdir()
+        server, state = notion_fake_server.start_server(fail_rate=args.fail_rate)
+        try:
+            scenario(SmokeRun(workspace, state.base_url, state))
+            print(f"SMOKE_OK={name}")
+        except SmokeFailure as exc:
+            failed += 1
+            print(f"SMOKE_FAILED={name}: {exc}", file=sys.stderr)
+        finally:
+            server.shutdown()
+            if args.keep:
+                print(f"SMOKE_WORKSPACE={workspace}")
+            else:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    print(f"SMOKE_RESULT={'FAILED' if failed else 'SUCCESS'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+bootstrap 번들용 내용 주소(content-addressed) 객체 저장소.
+
+파일 본문은 `.bootstrap/objects/<sha256>`에 한 번만 저장하고, 타임스탬프 번들
+(`.bootstrap/notion/<ts>/`)은 각 파일이 가리키는 객체 해시를 담은 `manifest.json`만 둔다.
+같은 내용은 번들이 몇 개든 디스크에 한 벌만 남으므로 디스크 사용량은 실제 변경분만큼만 늘어난다.
+
+- `migrate_bundles`: 본문 파일을 직접 담고 있던 기존 번들을 객체 저장소로 옮기고 중복 파일을 지운다.
+- `collect_garbage`: 어떤 manifest도 참조하지 않는 객체를 지운다.
+  `--output-dir`로 번들 상위 폴더 밖에 만든 번들은 저장소의 `.external-bundles.json`에 기록해 함께 훑는다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
+OBJECTS_DIR = WORKSPACE_ROOT / ".bootstrap" / "objects"
+BUNDLES_DIR = WORKSPACE_ROOT / ".bootstrap" / "notion"
+MANIFEST_NAME = "manifest.json"
+TEMP_PREFIX = ".tmp-"
+READ_CHUNK_BYTES = 1 << 20
+GRACE_SEC = 3600
+EXTERNAL_BUNDLES_NAME = ".external-bundles.json"
+OBJECT_NAME_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def normalize_bundle_path(bundle_rel_path: str) -> str:
+    # Windows에서 만든 예전 manifest는 `workspace\\AGENTS.md`처럼 역슬래시로 경로를 적었다.
+    return bundle_rel_path.replace("\\", "/")
+
+
+def object_path(sha256: str, objects_dir: Path = OBJECTS_DIR) -> Path:
+    return objects_dir / sha256
+
+
+def store_ref(bundle_dir: Path, objects_dir: Path) -> str:
+    # manifest에는 번들 폴더 기준 상대 경로로 저장소 위치를 남겨 폴더째 옮겨도 동작하게 한다.
+    try:
+        return Path(os.path.relpath(objects_dir, bundle_dir)).as_posix()
+    except ValueError:
+        return objects_dir.as_posix()
+
+
+def resolve_store(bundle_dir: Path, manifest: Dict) -> Path:
+    ref = manifest.get("object_store")
+    if isinstance(ref, str) and ref:
+        return (bundle_dir / ref).resolve()
+    return OBJECTS_DIR
+
+
+class ObjectWriter:
+    """
+    본문을 임시 파일에 이어 쓰면서 sha256을 누적하고, 닫을 때 `<sha256>` 이름으로 옮긴다.
+
+    같은 해시의 객체가 이미 있으면 임시 파일만 지우고 기존 객체의 수정 시각만 갱신한다
+    (manifest를 쓰기 전인 pull의 객체를 gc가 유예 기간 동안 남겨 두도록).
+    `with` 블록 안에서 예외가 나면 커밋하지 않고 임시 파일을 버린다.
+    """
+
+    def __init__(self, objects_dir: Path = OBJECTS_DIR) -> None:
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        self.objects_dir = objects_dir
+        self._temp = objects_dir / f"{TEMP_PREFIX}{uuid.uuid4().hex}"
+        self._handle = open(self._temp, "wb")
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.created = False
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self._handle.write(data)
+        self._digest.update(data)
+        self.size += len(data)
+
+    def commit(self) -> str:
+        self._handle.close()
+        sha256 = self._digest.hexdigest()
+        target = object_path(sha256, self.objects_dir)
+        if target.exists():
+            self._temp.unlink()
+            os.utime(target)
+        else:
+            os.replace(self._temp, target)
+            self.created = True
+        return sha256
+
+    def abort(self) -> None:
+        self._handle.close()
+        try:
+            self._temp.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "ObjectWriter":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        if exc_type is not None:
+            self.abort()
+        elif not self._handle.closed:
+            self.commit()
+
+
+def store_file(src: Path, objects_dir: Path = OBJECTS_DIR) -> Tuple[str, bool]:
+    with ObjectWriter(objects_dir) as writer, open(src, "rb") as handle:
+        for chunk in iter(lambda: handle.read(READ_CHUNK_BYTES), b""):
+            writer.write(chunk)
+        sha256 = writer.commit()
+    return sha256, writer.created
+
+
+def iter_manifests(bundles_dir: Path = BUNDLES_DIR) -> Iterator[Tuple[Path, Dict]]:
+    if not bundles_dir.is_dir():
+        return
+    for bundle_dir in sorted(p for p in bundles_dir.iterdir() if p.is_dir()):
+        mf = bundle_dir / MANIFEST_NAME
+        try:
+            manifest = json.loads(mf.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        if isinstance(manifest, dict) and isinstance(manifest.get("files"), list):
+            yield bundle_dir, manifest
+
+
+def latest_manifest(bundles_dir: Path = BUNDLES_DIR) -> Optional[Tuple[Path, Dict]]:
+    # generated_at_utc는 "YYYY-MM-DD HH:MM:SSZ" 형식이라 문자열 비교로 순서가 정해진다.
+    latest: Optional[Tuple[Path, Dict]] = None
+    for bundle_dir, manifest in iter_manifests(bundles_dir):
+        if latest is None or str(manifest.get("generated_at_utc", "")) >= str(latest[1].get("generated_at_utc", "")):
+            latest = (bundle_dir, manifest)
+    return latest
+
+
+def bundle_is_complete(bundle_dir: Path, manifest: Dict) -> bool:
+    # gc나 수동 삭제로 객체가 빠진 번들은 재사용하지 않는다.
+    objects_dir = resolve_store(bundle_dir, manifest)
+    for item in manifest["files"]:
+        if not isinstance(item, dict):
+            continue
+        sha256 = item.get("object")
+        if isinstance(sha256, str) and sha256:
+            if not object_path(sha256, objects_dir).is_file():
+                return False
+        elif not (bundle_dir / normalize_bundle_path(str(item.get("bundle_path", "")))).is_file():
+            return False
+    return True
+
+
+def _prune_empty_dirs(bundle_dir: Path) -> None:
+    for path in sorted(bundle_dir.rglob("*"), key=lambda p: len(p.parts), reverse=True):
+        if path.is_dir():
+            try:
+                path.rmdir()
+            except OSError:
+                pass
+
+
+def migrate_bundles(
+    bundles_dir: Path = BUNDLES_DIR,
+    objects_dir: Path = OBJECTS_DIR,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    본문 파일을 직접 담은 번들을 객체 저장소 참조로 바꾼다.
+
+    객체를 먼저 저장하고 manifest를 다시 쓴 뒤에만 번들 안의 본문 파일을 지우므로,
+    중간에 멈춰도 다시 실행하면 이어서 처리된다.
+    """
+    stats = {"bundles": 0, "files": 0, "stored": 0, "freed_bytes": 0}
+    for bundle_dir, manifest in iter_manifests(bundles_dir):
+        moved = []
+        for item in manifest["files"]:
+            if not isinstance(item, dict) or item.get("object"):
+                continue
+            bundle_rel = item.get("bundle_path")
+            if not isinstance(bundle_rel, str) or not bundle_rel:
+                continue
+            src = bundle_dir / normalize_bundle_path(bundle_rel)
+            if not src.is_file():
+                continue
+            stats["files"] += 1
+            stats["freed_bytes"] += src.stat().st_size
+            moved.append(src)
+            if dry_run:
+                continue
+            item["object"], created = store_file(src, objects_dir)
+            if created:
+                stats["stored"] += 1
+        if not moved:
+            continue
+        stats["bundles"] += 1
+        if dry_run:
+            continue
+        manifest["object_store"] = store_ref(bundle_dir, objects_dir)
+        (bundle_dir / MANIFEST_NAME).write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        for src in moved:
+            src.unlink()
+        _prune_empty_dirs(bundle_dir)
+    return stats
+
+
+def _read_external_bundles(objects_dir: Path) -> List[str]:
+    try:
+        entries = json.loads((objects_dir / EXTERNAL_BUNDLES_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    return [e for e in entries if isinstance(e, str)] if isinstance(entries, list) else []
+
+
+def register_bundle(bundle_dir: Path, bundles_dir: Path = BUNDLES_DIR, objects_dir: Path = OBJECTS_DIR) -> None:
+    # 번들 상위 폴더 밖의 번들은 gc가 찾을 수 있도록 저장소에 경로를 남긴다.
+    bundle_dir = bundle_dir.resolve()
+    if bundle_dir.parent == bundles_dir.resolve():
+        return
+    entries = _read_external_bundles(objects_dir)
+    if str(bundle_dir) in entries:
+        return
+    entries.append(str(bundle_dir))
+    objects_dir.mkdir(parents=True, exist_ok=True)
+    (objects_dir / EXTERNAL_BUNDLES_NAME).write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _iter_bundle_manifests(bundles_dir: Path, objects_dir: Path) -> Iterator[Tuple[Path, Dict]]:
+    yield from iter_manifests(bundles_dir)
+    for entry in _read_external_bundles(objects_dir):
+        mf = Path(entry) / MANIFEST_NAME
+        try:
+            manifest = json.loads(mf.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        if isinstance(manifest, dict) and isinstance(manifest.get("files"), list):
+            yield Path(entry), manifest
+
+
+def referenced_objects(bundles_dir: Path = BUNDLES_DIR, objects_dir: Path = OBJECTS_DIR) -> Set[str]:
+    refs: Set[str] = set()
+    for _, manifest in _iter_bundle_manifests(bundles_dir, objects_dir):
+        for item in manifest["files"]:
+            sha256 = item.get("object") if isinstance(item, dict) else None
+            if isinstance(sha256, str) and sha256:
+                refs.add(sha256)
+    return refs
+
+
+def collect_garbage(
+    bundles_dir: Path = BUNDLES_DIR,
+    objects_dir: Path = OBJECTS_DIR,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    # 참조 없는 객체라도 최근(GRACE_SEC 이내)에 쓰였으면 manifest를 아직 쓰지 않은 pull의 것일 수 있어 남긴다.
+    # 중단된 쓰기가 남긴 임시 파일도 같은 유예 뒤에 지운다. 목록에서 사라진 외부 번들 경로는 정리한다.
+    stats = {"kept": 0, "removed": 0, "freed_bytes": 0}
+    if not objects_dir.is_dir():
+        return stats
+    refs = referenced_objects(bundles_dir, objects_dir)
+    cutoff = time.time() - GRACE_SEC
+    for path in objects_dir.iterdir():
+        if not path.is_file() or not (OBJECT_NAME_RE.match(path.name) or path.name.startswith(TEMP_PREFIX)):
+            continue
+        if path.name in refs:
+            stats["kept"] += 1
+            continue
+        if path.stat().st_mtime > cutoff:
+            stats["kept"] += 1
+            continue
+        stats["removed"] += 1
+        stats["freed_bytes"] += path.stat().st_size
+        if not dry_run:
+            path.unlink()
+    external = _read_external_bundles(objects_dir)
+    live = [entry for entry in external if (Path(entry) / MANIFEST_NAME).is_file()]
+    if not dry_run and live != external:
+        (objects_dir / EXTERNAL_BUNDLES_NAME).write_text(json.dumps(live, ensure_ascii=False, indent=2), encoding="utf-8")
+    return stats
+
@@ -9,30 +9,64 @@ Codex/Workspace 설정 스냅샷을 Notion 페이지로 동기화한다.
 
 from __future__ import annotations
 
+import argparse
+import base64
 import datetime as dt
+import difflib
+import hashlib
+import io
 import json
+import lzma
 import os
 import re
 import sys
-import urllib.error
-import urllib.request
+import tarfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-
-NOTION_API_BASE = "https://api.notion.com/v1"
-NOTION_VERSION = "2022-06-28"
+import notion_http
+import notion_registry
 
 DEFAULT_ROOT_TITLE = "Notion MCP Server"
 SETTINGS_PAGE_TITLE = "codex_setting"
 ARCHIVE_PAGE_TITLE = "old"
 SNAPSHOT_TITLE_PREFIX = "Codex Settings Snapshot"
+CURRENT_PAGE_TITLE = f"{SNAPSHOT_TITLE_PREFIX} (current)"
+CHANGELOG_PAGE_TITLE = "Codex Settings Changelog"
+CURRENT_INTRO_LINES = [
+    "자동 동기화 현재 스냅샷 페이지입니다(실행마다 바뀐 블록만 제자리 갱신).",
+    f"변경 이력은 '{CHANGELOG_PAGE_TITLE}' 페이지에 기록됩니다.",
+]
 ROOT_PAGE_ID_ENV = "NOTION_SETTINGS_ROOT_PAGE_ID"
 TOKEN_ENV = "NOTION_MCP_TOKEN"
 
 MAX_RICH_TEXT_CHARS = 1800
-MAX_FILE_CHARS = 12000
+MAX_RICH_TEXT_SEGMENTS = 100
+MAX_CODE_BLOCK_BYTES = 200_000
+DEFAULT_MAX_TOTAL_CHARS = 5_000_000
+DEFAULT_COMPRESS_MIN_CHARS = 4000
+COMPRESSORS = {
+    "zlib": lambda data: zlib.compress(data, 9),
+    "lzma": lambda data: lzma.compress(data, preset=9),
+}
 APPEND_BATCH_SIZE = 80
+MIN_APPEND_BATCH_SIZE = 10
+APPEND_BATCH_STEP = 10
+# Notion 요청 본문 상한(약 500KB)보다 여유를 둔 배치 바이트 상한
+MAX_BATCH_BYTES = 400_000
+MIN_BATCH_BYTES = 50_000
+TARGET_BATCH_LATENCY_SEC = 3.0
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+TOGGLE_MAX_BYTES = MAX_BATCH_BYTES // 2
+PREFETCH_BLOCKS = APPEND_BATCH_SIZE * 2
+# Notion 단일 요청 파일 업로드 상한(20MB)
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+ARCHIVE_MANIFEST_NAME = "manifest.json"
 
 
 WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
@@ -88,30 +122,9 @@ def _request(
     path: str,
     token: str,
     payload: Optional[Dict] = None,
+    idempotent: Optional[bool] = None,
 ) -> Tuple[int, str]:
-    data = None
-    if payload is not None:
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-
-    req = urllib.request.Request(
-        f"{NOTION_API_BASE}{path}",
-        data=data,
-        method=method,
-    )
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Notion-Version", NOTION_VERSION)
-    req.add_header("Content-Type", "application/json")
-
-    try:
-        with urllib.request.urlopen(req, timeout=45) as resp:
-            body = resp.read().decode("utf-8", errors="replace")
-            return resp.status, body
-    except urllib.error.HTTPError as err:
-        try:
-            body = err.read().decode("utf-8", errors="replace")
-        except Exception:
-            body = ""
-        return err.code, body
+    return notion_http.request(method, path, token, payload, idempotent)
 
 
 def _json_or_none(text: str) -> Optional[Dict]:
@@ -156,35 +169,56 @@ def _extract_page_title(page_obj: Dict) -> str:
     return ""
 
 
+def iter_search_pages(token: str, query: str) -> Iterable[Dict]:
+    # 최근 수정 순으로 정렬해 모든 검색 결과 페이지를 next_cursor로 끝까지 순회한다.
+    cursor: Optional[str] = None
+    while True:
+        payload: Dict = {
+            "query": query,
+            "filter": {"property": "object", "value": "page"},
+            "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+            "page_size": 100,
+        }
+        if cursor:
+            payload["start_cursor"] = cursor
+        code, body = _request("POST", "/search", token, payload, idempotent=True)
+        _raise_if_failed(code, body, "페이지 검색")
+        parsed = _json_or_none(body) or {}
+        results = parsed.get("results")
+        if not isinstance(results, list):
+            raise RuntimeError("페이지 검색 결과 형식이 올바르지 않습니다.")
+        for page in results:
+            if isinstance(page, dict):
+                yield page
+        if not parsed.get("has_more"):
+            break
+        cursor = parsed.get("next_cursor")
+        if not isinstance(cursor, str) or not cursor:
+            break
+
+
 def find_root_page_id(token: str) -> str:
     pinned = os.getenv(ROOT_PAGE_ID_ENV, "").strip()
     if pinned:
         return pinned
 
-    payload = {
-        "query": DEFAULT_ROOT_TITLE,
-        "filter": {"property": "object", "value": "page"},
-        "page_size": 20,
-    }
-    code, body = _request("POST", "/search", token, payload)
-    _raise_if_failed(code, body, "루트 페이지 검색")
-    parsed = _json_or_none(body) or {}
-    results = parsed.get("results")
-    if not isinstance(results, list):
-        raise RuntimeError("루트 페이지 검색 결과 형식이 올바르지 않습니다.")
-
-    # 1) 정확히 제목이 일치하는 페이지 우선
-    for page in results:
-        if isinstance(page, dict) and _extract_page_title(page) == DEFAULT_ROOT_TITLE:
-            page_id = page.get("id")
-            if isinstance(page_id, str) and page_id:
-                return page_id
-
-    # 2) 없으면 첫 번째 검색 결과 사용
-    if results and isinstance(results[0], dict):
-        page_id = results[0].get("id")
-        if isinstance(page_id, str) and page_id:
+    other_titles: List[str] = []
+    for page in iter_search_pages(token, DEFAULT_ROOT_TITLE):
+        page_id = page.get("id")
+        if not isinstance(page_id, str) or not page_id:
+            continue
+        title = _extract_page_title(page)
+        # 정확히 제목이 일치하는 페이지를 찾으면 나머지 결과는 조회하지 않는다.
+        if title == DEFAULT_ROOT_TITLE:
             return page_id
+        other_titles.append(title)
+
+    # 비슷한 제목의 다른 페이지를 루트로 짐작하면 그 아래에 codex_setting이 만들어지고 레지스트리에도 남으므로 멈춘다.
+    if other_titles:
+        raise RuntimeError(
+            f"제목 '{DEFAULT_ROOT_TITLE}'와 정확히 일치하는 페이지가 없습니다(검색 결과: {', '.join(other_titles[:3])}). "
+            f"루트 페이지 ID를 {ROOT_PAGE_ID_ENV}에 지정하세요."
+        )
 
     raise RuntimeError(
         f"루트 페이지를 찾을 수 없습니다. 제목 '{DEFAULT_ROOT_TITLE}' 페이지 접근 권한을 확인하세요."
@@ -212,8 +246,54 @@ def list_block_children(token: str, block_id: str) -> List[Dict]:
     return out
 
 
+class ChildListingCache:
+    """
+    실행 단위 하위 블록 목록 캐시.
+
+    부모마다 페이지네이션은 최대 한 번만 수행하고, 이 실행이 직접 만든 변경
+    (하위 페이지 생성/아카이브, 블록 추가)으로만 캐시를 갱신하거나 무효화한다.
+    """
+
+    def __init__(self) -> None:
+        self._listings: Dict[str, List[Dict]] = {}
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str, parent_id: str) -> List[Dict]:
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(parent_id, threading.Lock())
+        # 같은 부모를 여러 워커가 동시에 요청해도 목록 조회는 한 번만 한다.
+        with fetch_lock:
+            with self._lock:
+                cached = self._listings.get(parent_id)
+                if cached is not None:
+                    return list(cached)
+            listing = list_block_children(token, parent_id)
+            with self._lock:
+                self._listings[parent_id] = listing
+                return list(listing)
+
+    def record_child(self, parent_id: str, block: Dict) -> None:
+        with self._lock:
+            cached = self._listings.get(parent_id)
+            if cached is not None:
+                cached.append(block)
+
+    def drop_child(self, block_id: str) -> None:
+        with self._lock:
+            for parent_id, cached in self._listings.items():
+                self._listings[parent_id] = [blk for blk in cached if blk.get("id") != block_id]
+
+    def invalidate(self, parent_id: str) -> None:
+        with self._lock:
+            self._listings.pop(parent_id, None)
+
+
+CHILD_LISTINGS = ChildListingCache()
+
+
 def find_child_page_by_title(token: str, parent_page_id: str, title: str) -> Optional[str]:
-    children = list_block_children(token, parent_page_id)
+    children = CHILD_LISTINGS.get(token, parent_page_id)
     for blk in children:
         if blk.get("type") != "child_page":
             continue
@@ -229,15 +309,25 @@ def find_child_page_by_title(token: str, parent_page_id: str, title: str) -> Opt
     return None
 
 
+def snapshot_intro_lines() -> List[str]:
+    return ["자동 동기화 스냅샷 페이지입니다.", f"생성 시각(UTC): {now_utc()}"]
+
+
 def create_child_page(
     token: str,
     parent_page_id: str,
     title: str,
     intro_lines: Optional[List[str]] = None,
+    content_blocks: Optional[List[Dict]] = None,
 ) -> Tuple[str, str]:
     intro = intro_lines if intro_lines is not None else []
     if not intro:
-        intro = ["자동 동기화 스냅샷 페이지입니다.", f"생성 시각(UTC): {now_utc()}"]
+        intro = snapshot_intro_lines()
+    children = [paragraph_block(line) for line in intro if line]
+    # 본문 첫 배치를 생성 요청에 함께 실어 append 왕복을 줄인다(블록의 children도 API가 허용하는 깊이까지 그대로 전달).
+    children.extend(content_blocks or [])
+    if len(children) > MAX_CHILDREN_PER_REQUEST:
+        raise RuntimeError(f"페이지 생성 시 children은 최대 {MAX_CHILDREN_PER_REQUEST}개입니다.")
 
     payload = {
         "parent": {"page_id": parent_page_id},
@@ -246,7 +336,7 @@ def create_child_page(
                 "title": [{"type": "text", "text": {"content": title}}],
             }
         },
-        "children": [paragraph_block(line) for line in intro if line],
+        "children": children,
     }
     code, body = _request("POST", "/pages", token, payload)
     _raise_if_failed(code, body, "스냅샷 페이지 생성")
@@ -257,6 +347,17 @@ def create_child_page(
         raise RuntimeError("생성된 페이지 ID를 파싱할 수 없습니다.")
     if not isinstance(url, str):
         url = ""
+    CHILD_LISTINGS.record_child(
+        parent_page_id,
+        {
+            "object": "block",
+            "id": page_id,
+            "type": "child_page",
+            "child_page": {"title": title},
+            "created_time": parsed.get("created_time", ""),
+            "has_children": bool(payload["children"]),
+        },
+    )
     return page_id, url
 
 
@@ -274,10 +375,72 @@ def ensure_child_page(token: str, parent_page_id: str, title: str, description:
     return page_id
 
 
+def resolve_sync_pages(token: str) -> Tuple[str, str, str]:
+    registry = notion_registry.PageRegistry.load(token)
+    root_page_id = registry.get("root")
+    settings_page_id = registry.get("settings")
+    archive_page_id = registry.get("archive")
+    pinned = os.getenv(ROOT_PAGE_ID_ENV, "").strip()
+    if pinned and root_page_id and notion_registry.normalize_page_id(pinned) != notion_registry.normalize_page_id(root_page_id):
+        root_page_id = None
+
+    # 저장된 ID는 부모 관계까지 GET 두 번으로 확인하고, 사라졌을 때만 재탐색한다.
+    if root_page_id and settings_page_id and archive_page_id:
+        if notion_registry.page_is_live(token, settings_page_id, root_page_id) and notion_registry.page_is_live(
+            token, archive_page_id, settings_page_id
+        ):
+            return root_page_id, settings_page_id, archive_page_id
+        registry.forget("root", "settings", "archive")
+
+    root_page_id = find_root_page_id(token)
+    settings_page_id = ensure_child_page(
+        token,
+        root_page_id,
+        SETTINGS_PAGE_TITLE,
+        "Codex 설정 스냅샷 전용 페이지",
+    )
+    archive_page_id = ensure_child_page(
+        token,
+        settings_page_id,
+        ARCHIVE_PAGE_TITLE,
+        "오래된 Codex 설정 스냅샷 보관 페이지",
+    )
+    registry.update(root=root_page_id, settings=settings_page_id, archive=archive_page_id)
+    try:
+        registry.save()
+    except OSError as exc:
+        eprint(f"페이지 ID 레지스트리 저장 실패(무시): {exc}")
+    return root_page_id, settings_page_id, archive_page_id
+
+
+def ensure_registered_page(
+    token: str,
+    key: str,
+    parent_page_id: str,
+    title: str,
+    intro_lines: List[str],
+) -> str:
+    registry = notion_registry.PageRegistry.load(token)
+    page_id = registry.get(key)
+    if page_id and notion_registry.page_is_live(token, page_id, parent_page_id):
+        return page_id
+
+    page_id = find_child_page_by_title(token, parent_page_id, title)
+    if not page_id:
+        page_id, _ = create_child_page(token, parent_page_id, title, intro_lines=intro_lines)
+    registry.update(**{key: page_id})
+    try:
+        registry.save()
+    except OSError as exc:
+        eprint(f"페이지 ID 레지스트리 저장 실패(무시): {exc}")
+    return page_id
+
+
 def archive_page(token: str, page_id: str) -> bool:
     payload = {"archived": True}
-    code, body = _request("PATCH", f"/pages/{page_id}", token, payload)
+    code, body = _request("PATCH", f"/pages/{page_id}", token, payload, idempotent=True)
     if 200 <= code < 300:
+        CHILD_LISTINGS.drop_child(page_id)
         return True
     parsed = _json_or_none(body) or {}
     msg = parsed.get("message") or parsed.get("code") or body[:300]
@@ -340,46 +503,150 @@ def rich_text_to_plain(rich_text: object) -> str:
     return "".join(out)
 
 
+class ArchiveTitleIndex:
+    """
+    archive(old) 페이지의 제목 -> page_id 인덱스.
+
+    실행당 한 번만 목록을 조회하고, 이후 보관되는 페이지는 메모리에서 갱신한다.
+    아카이브 워커들이 동시에 사용하므로 같은 제목은 한 워커만 복사하도록 선점(claim)한다.
+    선점 중인 제목을 요청한 워커는 결과를 기다렸다가, 복사가 실패해 풀리면 직접 복사를 이어받는다.
+    """
+
+    def __init__(self, titles: Dict[str, str], referenced: Optional[set[str]] = None) -> None:
+        self._titles = titles
+        self._claimed: set[str] = set()
+        self._cond = threading.Condition()
+        # 참조 방식으로 보관된(link_to_page로 기록된) 원본 page_id
+        self.referenced = referenced or set()
+
+    @classmethod
+    def load(cls, token: str, archive_parent_id: str) -> "ArchiveTitleIndex":
+        titles: Dict[str, str] = {}
+        referenced: set[str] = set()
+        for blk in CHILD_LISTINGS.get(token, archive_parent_id):
+            if blk.get("type") == "link_to_page":
+                link = blk.get("link_to_page")
+                if isinstance(link, dict) and isinstance(link.get("page_id"), str):
+                    referenced.add(notion_registry.normalize_page_id(link["page_id"]))
+                continue
+            if blk.get("type") != "child_page":
+                continue
+            child_page = blk.get("child_page")
+            page_id = blk.get("id")
+            if not isinstance(child_page, dict) or not isinstance(page_id, str) or not page_id:
+                continue
+            titles.setdefault(str(child_page.get("title", "")).strip(), page_id)
+        return cls(titles, referenced)
+
+    def claim(self, title: str) -> bool:
+        # 이미 보관본이 있으면 False, 이 워커가 복사해야 하면 True(다른 워커가 복사 중이면 끝날 때까지 기다린다).
+        with self._cond:
+            while title in self._claimed:
+                self._cond.wait()
+            if title in self._titles:
+                return False
+            self._claimed.add(title)
+            return True
+
+    def add(self, title: str, page_id: str) -> None:
+        with self._cond:
+            self._claimed.discard(title)
+            self._titles[title] = page_id
+            self._cond.notify_all()
+
+    def release(self, title: str) -> None:
+        with self._cond:
+            self._claimed.discard(title)
+            self._cond.notify_all()
+
+
+def is_file_toggle(block: Dict) -> bool:
+    toggle = block.get("toggle") if block.get("type") == "toggle" else None
+    if not isinstance(toggle, dict) or not block.get("has_children"):
+        return False
+    return rich_text_to_plain(toggle.get("rich_text")).startswith("file:")
+
+
+def expand_file_toggles(token: str, blocks: List[Dict]) -> List[Dict]:
+    # toggle 레이아웃 스냅샷은 보관본에서 파일별 toggle을 풀어 blocks 레이아웃과 같은 평면 목록으로 복사한다.
+    toggles = [blk for blk in blocks if is_file_toggle(blk)]
+    if not toggles:
+        return blocks
+    listings = notion_http.map_concurrently(lambda blk: list_block_children(token, blk["id"]), toggles)
+    children = {blk["id"]: listing for blk, listing in zip(toggles, listings)}
+    out: List[Dict] = []
+    for blk in blocks:
+        out.extend(children.get(blk.get("id"), [blk]))
+    return out
+
+
 def copy_snapshot_to_archive(
     token: str,
     source_page_id: str,
     source_title: str,
     archive_parent_id: str,
+    archive_index: Optional[ArchiveTitleIndex] = None,
 ) -> bool:
-    existed = find_child_page_by_title(token, archive_parent_id, source_title)
-    if existed:
+    if archive_index is None:
+        archive_index = ArchiveTitleIndex.load(token, archive_parent_id)
+    if not archive_index.claim(source_title):
         return True
 
-    new_page_id, _ = create_child_page(
-        token,
-        archive_parent_id,
-        source_title,
-        intro_lines=[
+    try:
+        source_blocks = expand_file_toggles(token, list_block_children(token, source_page_id))
+        appendable: List[Dict] = []
+        upload_bullet: Optional[int] = None
+        for blk in source_blocks:
+            converted = normalize_block_for_append(blk)
+            text = rich_text_to_plain((converted or {}).get("bulleted_list_item", {}).get("rich_text"))
+            if text.startswith("archive_upload_id:"):
+                upload_bullet = len(appendable)
+            if blk.get("type") == "file" and upload_bullet is not None:
+                # file_upload ID는 업로드 직후 한 번만 첨부할 수 있으므로, 호스팅된 첨부를 받아 새로 올린다.
+                upload_id, name = reupload_attachment(token, blk)
+                appendable[upload_bullet] = bullet_block(f"archive_upload_id: {upload_id}")
+                converted = file_upload_block(upload_id, name)
+            if converted:
+                appendable.append(converted)
+        intro_lines = [
             f"archive source page id: {source_page_id}",
             f"archived at(UTC): {now_utc()}",
-        ],
-    )
-    source_blocks = list_block_children(token, source_page_id)
-    appendable: List[Dict] = []
-    for blk in source_blocks:
-        converted = normalize_block_for_append(blk)
-        if converted:
-            appendable.append(converted)
-    if appendable:
-        append_children(token, new_page_id, appendable)
+        ]
+        batches = APPEND_BATCHER.batches(appendable, MAX_CHILDREN_PER_REQUEST - len(intro_lines))
+        new_page_id, _ = create_child_page(
+            token,
+            archive_parent_id,
+            source_title,
+            intro_lines=intro_lines,
+            content_blocks=next(batches, []),
+        )
+    except Exception:
+        archive_index.release(source_title)
+        raise
+    try:
+        append_batches(token, new_page_id, batches)
+    except Exception:
+        # 반쯤 채워진 사본은 보관본으로 치지 않는다(기다리던 워커가 복사를 이어받는다).
+        archive_index.release(source_title)
+        try:
+            archive_page(token, new_page_id)
+        except Exception as cleanup_exc:
+            eprint(f"미완성 보관 사본 정리 실패(page_id={new_page_id}): {cleanup_exc}")
+        raise
+    # 내용을 모두 붙인 뒤에야 제목을 등록해, 같은 제목을 기다리던 워커가 원본을 보관 이동해도 되게 한다.
+    archive_index.add(source_title, new_page_id)
     return True
 
 
-def archive_snapshot_pages(
+def collect_archive_candidates(
     token: str,
     source_parent_id: str,
     archive_parent_id: str,
     keep_page_ids: set[str],
     skip_page_ids: set[str],
-) -> Tuple[int, int]:
-    archived = 0
-    failed = 0
-    children = list_block_children(token, source_parent_id)
+) -> List[Tuple[str, str]]:
+    candidates: List[Tuple[str, str]] = []
+    children = CHILD_LISTINGS.get(token, source_parent_id)
     for blk in children:
         if blk.get("type") != "child_page":
             continue
@@ -393,27 +660,452 @@ def archive_snapshot_pages(
         child_page = blk.get("child_page")
         if isinstance(child_page, dict):
             title = str(child_page.get("title", "")).strip()
-        if not title.startswith(SNAPSHOT_TITLE_PREFIX):
+        # `--in-place`의 현재 페이지는 일반 동기화 뒤에도 그 자리에서 계속 갱신되므로 보관하지 않는다.
+        if not title.startswith(SNAPSHOT_TITLE_PREFIX) or title == CURRENT_PAGE_TITLE:
             continue
+        candidates.append((page_id, title))
+    return candidates
+
+
+def archive_one_snapshot(
+    token: str,
+    page_id: str,
+    title: str,
+    archive_parent_id: str,
+    archive_index: ArchiveTitleIndex,
+) -> Tuple[str, str, float]:
+    started = time.monotonic()
+    status = "failed"
+    try:
+        copy_snapshot_to_archive(token, page_id, title, archive_parent_id, archive_index)
+        if archive_page(token, page_id):
+            status = "archived"
+    except Exception as exc:
+        eprint(f"old 보관 처리 실패(page_id={page_id}): {exc}")
+    return page_id, status, time.monotonic() - started
 
+
+def archive_snapshot_pages(
+    token: str,
+    candidates: List[Tuple[str, str]],
+    archive_parent_id: str,
+    workers: Optional[int] = None,
+) -> Tuple[int, int, List[Tuple[str, str, float]]]:
+    if not candidates:
+        return 0, 0, []
+    # old 목록은 실행당 한 번만 조회하고, 이후 존재 확인은 메모리 인덱스로 O(1) 처리한다.
+    archive_index = ArchiveTitleIndex.load(token, archive_parent_id)
+    # 페이지별 복사+아카이브를 워커 풀로 동시에 처리한다(요청 속도는 공유 토큰 버킷이 제한).
+    timings = notion_http.map_concurrently(
+        lambda item: archive_one_snapshot(token, item[0], item[1], archive_parent_id, archive_index),
+        candidates,
+        workers,
+    )
+    archived = sum(1 for _, status, _ in timings if status == "archived")
+    return archived, len(timings) - archived, timings
+
+
+def block_payload_bytes(block: Dict) -> int:
+    return len(json.dumps(block, ensure_ascii=False).encode("utf-8"))
+
+
+def block_count(block: Dict) -> int:
+    # 요청 하나에 실리는 블록 수 한도는 중첩 children까지 합산된다.
+    payload = block.get(str(block.get("type", "")))
+    children = payload.get("children") if isinstance(payload, dict) else None
+    return 1 + (len(children) if isinstance(children, list) else 0)
+
+
+# 요청 본문 크기/블록 수 한도를 넘었을 때의 validation_error 메시지만 배치 분할 대상으로 본다.
+# (rich_text 길이처럼 블록 하나의 값이 잘못된 경우는 나눠 보내도 같은 오류가 나므로 바로 실패시킨다)
+OVERSIZED_BODY_RE = re.compile(r"too large|exceed|body\.children\.length|payload", re.IGNORECASE)
+
+
+def _is_oversized_body(code: int, body: str) -> bool:
+    if code == 413:
+        return True
+    parsed = _json_or_none(body) or {}
+    if code != 400 or parsed.get("code") != "validation_error":
+        return False
+    return bool(OVERSIZED_BODY_RE.search(str(parsed.get("message", ""))))
+
+
+class AppendBatcher:
+    """
+    블록 수와 직렬화 바이트 크기를 함께 보고 append 배치를 나눈다.
+
+    배치 크기는 실행 중 관측한 요청 지연에 맞춰 늘리거나 줄이고(AIMD),
+    본문 초과로 거절되면 배치를 반으로 나눠 다시 보내면서 바이트 상한도 낮춘다.
+    """
+
+    def __init__(
+        self,
+        limit: int = APPEND_BATCH_SIZE,
+        max_bytes: int = MAX_BATCH_BYTES,
+        target_latency: float = TARGET_BATCH_LATENCY_SEC,
+    ) -> None:
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+
+    def batches(self, blocks: Iterable[Dict], first_limit: Optional[int] = None) -> Iterator[List[Dict]]:
+        batch: List[Dict] = []
+        size = 0
+        nested = 0
+        limit = first_limit or self.limit
+        for blk in blocks:
+            blk_bytes = block_payload_bytes(blk)
+            blk_count = block_count(blk)
+            if batch and (
+                len(batch) >= limit
+                or size + blk_bytes > self.max_bytes
+                or nested + blk_count > MAX_BLOCKS_PER_REQUEST
+            ):
+                yield batch
+                batch, size, nested = [], 0, 0
+                limit = self.limit
+            batch.append(blk)
+            size += blk_bytes
+            nested += blk_count
+        if batch:
+            yield batch
+
+    def observe(self, count: int, elapsed: float) -> None:
+        with self._lock:
+            if elapsed > self.target_latency:
+                self.limit = max(MIN_APPEND_BATCH_SIZE, min(self.limit, count) * 3 // 4)
+            elif elapsed < self.target_latency / 2 and count >= self.limit:
+                self.limit = min(MAX_CHILDREN_PER_REQUEST, self.limit + APPEND_BATCH_STEP)
+
+    def shrink_bytes(self, rejected_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max(MIN_BATCH_BYTES, min(self.max_bytes, rejected_bytes // 2))
+
+
+APPEND_BATCHER = AppendBatcher()
+
+
+def reference_index_blocks(page_id: str, title: str, files: Dict[str, str]) -> List[Dict]:
+    entry = {
+        "title": title,
+        "page_id": page_id,
+        "archived_at_utc": now_utc(),
+        "files": files,
+    }
+    text = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return [link_to_page_block(page_id), packed_code_block(list(chunk_text(text)), "json")]
+
+
+def archive_snapshot_references(
+    token: str,
+    candidates: List[Tuple[str, str]],
+    archive_parent_id: str,
+    snapshot_hashes: Dict[str, Dict[str, str]],
+) -> Tuple[int, int, List[Tuple[str, str, float]]]:
+    """
+    스냅샷 페이지를 복사/아카이브하지 않고 제자리에 둔 채 old 아래 색인에만 기록한다.
+
+    페이지마다 link_to_page 블록과 제목/ID/보관 시각/파일 해시 JSON을 남기며,
+    이번 실행의 모든 항목을 배치 append로 한꺼번에 보낸다.
+    """
+    if not candidates:
+        return 0, 0, []
+    started = time.monotonic()
+    archive_index = ArchiveTitleIndex.load(token, archive_parent_id)
+    fresh = [
+        (page_id, title)
+        for page_id, title in candidates
+        if notion_registry.normalize_page_id(page_id) not in archive_index.referenced
+    ]
+    blocks: List[Dict] = []
+    for page_id, title in fresh:
+        files = snapshot_hashes.get(notion_registry.normalize_page_id(page_id), {})
+        blocks.extend(reference_index_blocks(page_id, title, files))
+    status = "referenced"
+    try:
+        append_children(token, archive_parent_id, blocks)
+    except Exception as exc:
+        eprint(f"old 참조 색인 기록 실패: {exc}")
+        status = "failed"
+    elapsed = time.monotonic() - started
+    timings = [(page_id, status, elapsed) for page_id, _ in fresh]
+    done = len(fresh) if status == "referenced" else 0
+    return done, len(fresh) - done, timings
+
+
+@dataclass
+class RetentionPolicy:
+    # 최근 N개 + 일/주 단위 대표(각 기간의 최신 1개)를 남기고 나머지 보관본은 휴지통으로 보낸다.
+    keep_last: int = 0
+    keep_daily: int = 0
+    keep_weekly: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.keep_last or self.keep_daily or self.keep_weekly)
+
+    def retained(self, stamps: List[Tuple[str, dt.datetime]]) -> set[str]:
+        ordered = sorted(stamps, key=lambda item: item[1], reverse=True)
+        keep = {key for key, _ in ordered[: self.keep_last]}
+        for limit, period in (
+            (self.keep_daily, lambda stamp: stamp.date()),
+            (self.keep_weekly, lambda stamp: stamp.isocalendar()[:2]),
+        ):
+            seen: set = set()
+            for key, stamp in ordered:
+                if len(seen) >= limit:
+                    break
+                bucket = period(stamp)
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(key)
+        return keep
+
+
+def snapshot_stamp(title: str, created_time: str = "") -> Optional[dt.datetime]:
+    stamp = title[len(SNAPSHOT_TITLE_PREFIX) :].strip()
+    for value, fmt in ((stamp, "%Y-%m-%d %H:%M:%SZ"), (created_time[:19], "%Y-%m-%dT%H:%M:%S")):
+        try:
+            return dt.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def collect_archive_entries(token: str, archive_parent_id: str) -> List[Tuple[str, dt.datetime, List[Dict]]]:
+    # (원본 page_id, 시각, old 아래에서 이 항목을 이루는 블록들): 복사본은 child_page 하나,
+    # 참조 항목은 link_to_page + JSON code 블록 한 쌍이다.
+    entries: List[Tuple[str, dt.datetime, List[Dict]]] = []
+    children = CHILD_LISTINGS.get(token, archive_parent_id)
+    for index, blk in enumerate(children):
+        btype = blk.get("type")
+        if btype == "child_page":
+            title = str((blk.get("child_page") or {}).get("title", "")).strip()
+            stamp = snapshot_stamp(title, str(blk.get("created_time", "")))
+            if title.startswith(SNAPSHOT_TITLE_PREFIX) and stamp:
+                entries.append((blk["id"], stamp, [blk]))
+        elif btype == "link_to_page" and index + 1 < len(children):
+            code_blk = children[index + 1]
+            code_obj = code_blk.get("code") if code_blk.get("type") == "code" else None
+            entry = _json_or_none(rich_text_to_plain(code_obj.get("rich_text"))) if isinstance(code_obj, dict) else None
+            if not entry or not isinstance(entry.get("page_id"), str):
+                continue
+            stamp = snapshot_stamp(str(entry.get("title", "")))
+            if stamp:
+                entries.append((entry["page_id"], stamp, [blk, code_blk]))
+    return entries
+
+
+def snapshot_ref_page_ids(token: str, page_id: str) -> set[str]:
+    # 증분 스냅샷이 본문을 빌려 쓰는 원본 page_id("ref_page_id: ..." 줄, toggle 레이아웃이면 toggle 안)
+    refs: set[str] = set()
+    for blk in expand_file_toggles(token, list_block_children(token, page_id)):
+        item = blk.get("bulleted_list_item") if blk.get("type") == "bulleted_list_item" else None
+        text = rich_text_to_plain(item.get("rich_text")) if isinstance(item, dict) else ""
+        if text.startswith("ref_page_id:"):
+            refs.add(notion_registry.normalize_page_id(text.partition(":")[2].strip()))
+    return refs
+
+
+def prune_archive(
+    token: str,
+    archive_parent_id: str,
+    policy: RetentionPolicy,
+    keep_page_ids: set[str],
+) -> Tuple[int, int]:
+    """
+    old 아래 보관본에 보존 정책을 적용해 남길 대상 밖의 항목을 정리한다.
+
+    복사본 페이지는 휴지통으로 보내고, 참조 항목은 색인 블록을 지운 뒤 제자리에 남아 있던 원본을 휴지통으로 보낸다.
+    남기는 보관본이 `body: ref`로 본문을 빌려 쓰는 원본 페이지는 정리 대상이어도 남긴다
+    (남긴 보관본을 읽지 못하면 이번 실행의 정리는 건너뛴다).
+    요청은 워커 풀로 동시에 보내되 속도는 공유 토큰 버킷이 제한한다.
+    """
+    if not policy.enabled:
+        return 0, 0
+    entries = collect_archive_entries(token, archive_parent_id)
+    keep = policy.retained([(page_id, stamp) for page_id, stamp, _ in entries])
+    keep_norm = {notion_registry.normalize_page_id(pid) for pid in keep_page_ids}
+    doomed = [
+        (page_id, blocks)
+        for page_id, _, blocks in entries
+        if page_id not in keep and notion_registry.normalize_page_id(page_id) not in keep_norm
+    ]
+    if doomed:
+        retained = [pid for pid in keep if notion_registry.normalize_page_id(pid) not in keep_norm]
+        try:
+            ref_sets = notion_http.map_concurrently(lambda pid: snapshot_ref_page_ids(token, pid), retained)
+        except Exception as exc:
+            eprint(f"보관본 참조 확인 실패(정리 건너뜀): {exc}")
+            return 0, 0
+        protected = keep_norm.union(*ref_sets)
+        doomed = [item for item in doomed if notion_registry.normalize_page_id(item[0]) not in protected]
+
+    def prune_one(item: Tuple[str, List[Dict]]) -> bool:
+        page_id, blocks = item
         try:
-            copy_snapshot_to_archive(token, page_id, title, archive_parent_id)
-            if archive_page(token, page_id):
-                archived += 1
-            else:
-                failed += 1
+            if blocks[0].get("type") == "child_page":
+                return archive_page(token, page_id)
+            for blk in blocks:
+                delete_block(token, blk)
+            return archive_page(token, page_id)
         except Exception as exc:
-            eprint(f"old 보관 처리 실패(page_id={page_id}): {exc}")
-            failed += 1
-    return archived, failed
+            eprint(f"보관본 정리 실패(page_id={page_id}): {exc}")
+            return False
 
+    results = notion_http.map_concurrently(prune_one, doomed)
+    if doomed:
+        CHILD_LISTINGS.invalidate(archive_parent_id)
+    pruned = sum(1 for ok in results if ok)
+    return pruned, len(results) - pruned
+
+
+def _append_batch(
+    token: str,
+    block_id: str,
+    batch: List[Dict],
+    batcher: AppendBatcher,
+    after: Optional[str] = None,
+) -> Optional[str]:
+    payload: Dict = {"children": batch}
+    if after:
+        payload["after"] = after
+    started = time.monotonic()
+    code, body = _request("PATCH", f"/blocks/{block_id}/children", token, payload)
+    if len(batch) > 1 and _is_oversized_body(code, body):
+        # 거절된 요청은 아무것도 추가하지 않으므로 반으로 나눠 순서대로 다시 보낸다.
+        batcher.shrink_bytes(sum(block_payload_bytes(blk) for blk in batch))
+        half = len(batch) // 2
+        last = _append_batch(token, block_id, batch[:half], batcher, after)
+        if after and not last:
+            # 기준 블록 없이 보내면 뒤쪽 절반이 페이지 끝에 붙어 순서가 깨진다(after로 돌아가면 앞쪽 절반보다 앞에 붙는다).
+            raise RuntimeError("추가된 블록 ID를 파싱할 수 없습니다.")
+        return _append_batch(token, block_id, batch[half:], batcher, last if after else None)
+    _raise_if_failed(code, body, "블록 추가")
+    batcher.observe(len(batch), time.monotonic() - started)
+    results = (_json_or_none(body) or {}).get("results")
+    if isinstance(results, list) and results and isinstance(results[-1], dict):
+        return results[-1].get("id")
+    return None
+
+
+def append_batches(
+    token: str,
+    block_id: str,
+    batches: Iterable[List[Dict]],
+    batcher: AppendBatcher = APPEND_BATCHER,
+    after: Optional[str] = None,
+) -> Optional[str]:
+    # after가 있으면 그 블록 뒤에 이어 붙이고, 배치마다 마지막으로 추가된 블록을 다음 기준으로 삼는다.
+    try:
+        for batch in batches:
+            last = _append_batch(token, block_id, batch, batcher, after)
+            if after:
+                if not last:
+                    raise RuntimeError("추가된 블록 ID를 파싱할 수 없습니다.")
+                after = last
+        return after
+    finally:
+        CHILD_LISTINGS.invalidate(block_id)
+
+
+def append_children(
+    token: str,
+    block_id: str,
+    blocks: Iterable[Dict],
+    batcher: AppendBatcher = APPEND_BATCHER,
+) -> None:
+    # blocks는 제너레이터여도 되며, 배치가 찰 때마다 바로 업로드한다.
+    append_batches(token, block_id, batcher.batches(blocks), batcher)
+
+
+def block_signature(block: Dict) -> str:
+    btype = str(block.get("type", ""))
+    payload = block.get(btype)
+    if not isinstance(payload, dict):
+        payload = {}
+    rich = payload.get("rich_text")
+    text = ""
+    if isinstance(rich, list):
+        text = "".join(
+            str(item.get("plain_text", (item.get("text") or {}).get("content", "")))
+            for item in rich
+            if isinstance(item, dict)
+        )
+    return f"{btype}\x00{payload.get('language', '')}\x00{text}"
 
-def append_children(token: str, block_id: str, blocks: List[Dict]) -> None:
-    for i in range(0, len(blocks), APPEND_BATCH_SIZE):
-        batch = blocks[i : i + APPEND_BATCH_SIZE]
-        payload = {"children": batch}
-        code, body = _request("PATCH", f"/blocks/{block_id}/children", token, payload)
-        _raise_if_failed(code, body, "블록 추가")
+
+def update_block(token: str, block: Dict, desired: Dict) -> None:
+    btype = desired["type"]
+    payload = {btype: {k: v for k, v in desired[btype].items() if k != "children"}}
+    code, body = _request("PATCH", f"/blocks/{block['id']}", token, payload, idempotent=True)
+    _raise_if_failed(code, body, "블록 수정")
+
+
+def delete_block(token: str, block: Dict) -> None:
+    code, body = _request("DELETE", f"/blocks/{block['id']}", token)
+    if code != 404:
+        _raise_if_failed(code, body, "블록 삭제")
+
+
+def patch_page_blocks(
+    token: str,
+    page_id: str,
+    existing: List[Dict],
+    desired: List[Dict],
+    batcher: AppendBatcher = APPEND_BATCHER,
+) -> Dict[str, int]:
+    """
+    페이지의 기존 블록 목록을 desired와 비교해 달라진 구간만 수정/삭제/삽입한다.
+
+    같은 타입끼리 짝이 맞는 블록은 PATCH로 내용만 바꾸고, 남는 기존 블록은 삭제,
+    모자란 블록은 직전에 유지된 블록 뒤(after)에 배치로 삽입한다.
+    """
+    counts = {"kept": 0, "updated": 0, "deleted": 0, "inserted": 0}
+    old_sigs = [block_signature(blk) for blk in existing]
+    new_sigs = [block_signature(blk) for blk in desired]
+    if existing and (not new_sigs or old_sigs[0] != new_sigs[0]):
+        # 맨 앞에는 삽입 기준(after)이 될 블록이 없으므로 첫 블록이 다르면 전체를 다시 쓴다.
+        notion_http.map_concurrently(lambda blk: delete_block(token, blk), existing)
+        append_children(token, page_id, desired, batcher)
+        counts.update(deleted=len(existing), inserted=len(desired))
+        return counts
+
+    updates: List[Tuple[Dict, Dict]] = []
+    deletes: List[Dict] = []
+    inserts: List[Tuple[Optional[str], List[Dict]]] = []
+    anchor: Optional[str] = None
+    matcher = difflib.SequenceMatcher(None, old_sigs, new_sigs, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            counts["kept"] += i2 - i1
+            anchor = existing[i2 - 1]["id"]
+            continue
+        old_part = existing[i1:i2]
+        new_part = desired[j1:j2]
+        paired = 0
+        for old_blk, new_blk in zip(old_part, new_part):
+            if old_blk.get("type") != new_blk.get("type") or old_blk.get("has_children"):
+                break
+            updates.append((old_blk, new_blk))
+            anchor = old_blk["id"]
+            paired += 1
+        deletes.extend(old_part[paired:])
+        if new_part[paired:]:
+            inserts.append((anchor, new_part[paired:]))
+
+    # 수정/삭제는 서로 위치에 영향을 주지 않으므로 동시에 보내고, 삽입은 기준 블록 뒤로 순서대로 붙인다.
+    notion_http.map_concurrently(lambda pair: update_block(token, pair[0], pair[1]), updates)
+    notion_http.map_concurrently(lambda blk: delete_block(token, blk), deletes)
+    for after, blocks in inserts:
+        append_batches(token, page_id, batcher.batches(blocks), batcher, after)
+    counts.update(
+        updated=len(updates),
+        deleted=len(deletes),
+        inserted=sum(len(blocks) for _, blocks in inserts),
+    )
+    return counts
 
 
 def heading2_block(text: str) -> Dict:
@@ -459,6 +1151,69 @@ def code_block(text: str, language: str = "plain text") -> Dict:
     }
 
 
+def link_to_page_block(page_id: str) -> Dict:
+    return {
+        "object": "block",
+        "type": "link_to_page",
+        "link_to_page": {"type": "page_id", "page_id": page_id},
+    }
+
+
+def toggle_block(text: str, children: List[Dict]) -> Dict:
+    return {
+        "object": "block",
+        "type": "toggle",
+        "toggle": {"rich_text": [rich_text(text)], "children": children},
+    }
+
+
+def file_upload_block(upload_id: str, name: str) -> Dict:
+    return {
+        "object": "block",
+        "type": "file",
+        "file": {
+            "type": "file_upload",
+            "file_upload": {"id": upload_id},
+            "name": name,
+        },
+    }
+
+
+def packed_code_block(parts: List[str], language: str = "plain text") -> Dict:
+    return {
+        "object": "block",
+        "type": "code",
+        "code": {
+            "language": language,
+            "rich_text": [rich_text(part) for part in parts],
+        },
+    }
+
+
+def iter_code_blocks(text: str, pack: bool = False) -> Iterator[Dict]:
+    if not pack:
+        for part in chunk_text(text):
+            yield code_block(part)
+        return
+    # code 블록 하나에 rich_text 세그먼트를 최대 100개까지 채운다(요청 본문 한도를 넘지 않도록 바이트도 제한).
+    # pull 쪽은 블록 안의 모든 세그먼트를 이어 붙이므로 본문은 그대로 복원된다.
+    parts: List[str] = []
+    size = 0
+    for part in chunk_text(text):
+        part_bytes = len(part.encode("utf-8"))
+        if parts and (len(parts) >= MAX_RICH_TEXT_SEGMENTS or size + part_bytes > MAX_CODE_BLOCK_BYTES):
+            yield packed_code_block(parts)
+            parts, size = [], 0
+        parts.append(part)
+        size += part_bytes
+    if parts:
+        yield packed_code_block(parts)
+
+
+def code_blocks(text: str, pack: bool = False) -> List[Dict]:
+    return list(iter_code_blocks(text, pack))
+
+
 def rich_text(text: str) -> Dict:
     safe = text[:MAX_RICH_TEXT_CHARS]
     return {"type": "text", "text": {"content": safe}}
@@ -519,37 +1274,130 @@ def display_path(path: Path) -> str:
     return raw
 
 
-def trimmed_for_notion(text: str, limit: int = MAX_FILE_CHARS) -> Tuple[str, bool]:
-    if len(text) <= limit:
-        return text, False
-    return text[:limit], True
+@dataclass
+class SnapshotOptions:
+    pack_code: bool = False
+    max_total_chars: int = DEFAULT_MAX_TOTAL_CHARS
+    used_chars: int = field(default=0, repr=False)
+    # 증분 모드: 이전 스냅샷과 해시가 같은 파일은 본문 대신 (path, sha256, 본문이 있는 page_id) 참조만 기록한다.
+    incremental: bool = False
+    page_id: str = ""
+    previous_files: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    recorded_files: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    # 전체 본문 한도를 넘어 본문 없이 기록된 파일(변경 로그에서 삭제와 구분한다).
+    omitted_files: set[str] = field(default_factory=set)
+    # 압축 모드: compress_min_chars 이상인 파일은 압축 후 base85 텍스트로 기록한다(작은 파일은 평문 유지).
+    compress: Optional[str] = None
+    compress_min_chars: int = DEFAULT_COMPRESS_MIN_CHARS
+    # toggle 레이아웃: 파일별 메타데이터/본문을 "file: <path>" toggle 하위에 넣어 pull이 필요한 파일만 펼치게 한다.
+    toggle_files: bool = False
+
+    def referenced_page_ids(self) -> set[str]:
+        return {
+            info["page_id"]
+            for info in self.recorded_files.values()
+            if info.get("page_id") and info["page_id"] != self.page_id
+        }
+
+    def bind_page(self, page_id: str) -> None:
+        # 본문을 이 스냅샷에 직접 기록한 파일은 페이지 생성 후 page_id를 채운다.
+        self.page_id = page_id
+        for info in self.recorded_files.values():
+            if not info.get("page_id"):
+                info["page_id"] = page_id
+
+    def reserve(self, chars: int) -> bool:
+        # 파일 본문은 잘라서 올리지 않는다: 남은 한도 안에 전부 들어가거나, 본문 없이 기록한다.
+        if self.used_chars + chars > self.max_total_chars:
+            return False
+        self.used_chars += chars
+        return True
 
 
-def file_blocks(label: str, path: Path, include_body: bool = True) -> List[Dict]:
-    blocks: List[Dict] = [heading3_block(label), bullet_block(f"path: {display_path(path)}")]
+def encode_body(text: str, options: SnapshotOptions) -> Tuple[Optional[str], str]:
+    if not options.compress or len(text) < options.compress_min_chars:
+        return None, text
+    packed = COMPRESSORS[options.compress](text.encode("utf-8"))
+    payload = base64.b85encode(packed).decode("ascii")
+    # 압축해도 줄지 않는 본문은 사람이 읽을 수 있는 평문으로 둔다.
+    if len(payload) >= len(text):
+        return None, text
+    return f"{options.compress}+base85", payload
+
+
+def iter_file_blocks(
+    label: str,
+    path: Path,
+    include_body: bool = True,
+    options: Optional[SnapshotOptions] = None,
+) -> Iterator[Dict]:
+    opts = options or SnapshotOptions()
+    yield heading3_block(label)
+    yield bullet_block(f"path: {display_path(path)}")
     if not path.exists():
-        blocks.append(paragraph_block("파일이 존재하지 않습니다."))
-        return blocks
+        yield bullet_block("body: missing")
+        yield paragraph_block("파일이 존재하지 않습니다.")
+        return
 
     stat = path.stat()
-    blocks.append(bullet_block(f"size: {stat.st_size} bytes"))
-    blocks.append(
-        bullet_block(
-            "modified(UTC): "
-            + dt.datetime.utcfromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%SZ")
-        )
+    yield bullet_block(f"size: {stat.st_size} bytes")
+    yield bullet_block(
+        "modified(UTC): "
+        + dt.datetime.utcfromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%SZ")
     )
     if not include_body:
-        return blocks
+        return
 
     raw = read_utf8(path)
     sanitized = sanitize_text(raw)
-    body, truncated = trimmed_for_notion(sanitized)
-    for part in chunk_text(body):
-        blocks.append(code_block(part))
-    if truncated:
-        blocks.append(paragraph_block("본문이 길어 일부를 잘라서 기록했습니다."))
-    return blocks
+    # pull 쪽이 복원 결과가 완전한지 검증할 수 있도록 업로드 본문의 해시/길이를 함께 기록한다.
+    digest = hashlib.sha256(sanitized.encode("utf-8")).hexdigest()
+    yield bullet_block(f"sha256: {digest}")
+    yield bullet_block(f"chars: {len(sanitized)}")
+
+    index_key = display_path(path)
+    previous = opts.previous_files.get(index_key) if opts.incremental else None
+    if previous and previous.get("sha256") == digest and previous.get("page_id"):
+        yield bullet_block("body: ref")
+        yield bullet_block(f"ref_page_id: {previous['page_id']}")
+        opts.recorded_files[index_key] = {"sha256": digest, "page_id": previous["page_id"]}
+        return
+
+    encoding, stored = encode_body(sanitized, opts)
+    if not opts.reserve(len(stored)):
+        yield bullet_block("body: omitted")
+        opts.omitted_files.add(index_key)
+        yield paragraph_block(f"전체 본문 한도({opts.max_total_chars}자)를 넘어 본문을 기록하지 않았습니다.")
+        return
+    if encoding:
+        # sha256/chars는 복원(압축 해제) 후 본문 기준이다.
+        yield bullet_block(f"encoding: {encoding}")
+    yield from iter_code_blocks(stored, pack=opts.pack_code)
+    opts.recorded_files[index_key] = {"sha256": digest, "page_id": opts.page_id}  # 생성 전이면 bind_page가 채움
+
+
+def iter_toggle_file_blocks(
+    label: str,
+    path: Path,
+    include_body: bool = True,
+    options: Optional[SnapshotOptions] = None,
+) -> Iterator[Dict]:
+    # 제목(heading_3)은 밖에 두고 나머지를 "file: <path>" toggle로 감싼다.
+    # toggle 하나의 children은 요청 한도 안으로 나누고, 넘치면 같은 제목의 toggle을 이어 붙인다.
+    blocks = iter_file_blocks(label, path, include_body, options)
+    yield next(blocks)
+    title = f"file: {display_path(path)}"
+    for children in AppendBatcher(MAX_CHILDREN_PER_REQUEST, TOGGLE_MAX_BYTES).batches(blocks):
+        yield toggle_block(title, children)
+
+
+def file_blocks(
+    label: str,
+    path: Path,
+    include_body: bool = True,
+    options: Optional[SnapshotOptions] = None,
+) -> List[Dict]:
+    return list(iter_file_blocks(label, path, include_body, options))
 
 
 def collect_skill_inventory(skill_root: Path) -> List[Path]:
@@ -558,38 +1406,19 @@ def collect_skill_inventory(skill_root: Path) -> List[Path]:
     return sorted(skill_root.glob("*/SKILL.md"))
 
 
-def build_sync_blocks() -> List[Dict]:
-    blocks: List[Dict] = []
+FileTarget = Tuple[str, Path, bool]
 
-    # 1) 개요
-    blocks.append(heading2_block("동기화 개요"))
-    blocks.append(paragraph_block("MCP 우회 경로(Notion REST API)로 설정 스냅샷을 기록합니다."))
-    blocks.append(paragraph_block(f"workspace: {display_path(WORKSPACE_ROOT)}"))
-    blocks.append(paragraph_block(f"global codex root: {display_path(GLOBAL_CODEX_ROOT)}"))
 
-    # 2) 전역 규칙/설정
-    blocks.append(heading2_block("전역 규칙/설정"))
-    global_files = [
+def global_file_targets() -> List[FileTarget]:
+    return [
         ("Global AGENTS", GLOBAL_CODEX_ROOT / "AGENTS.md", True),
         ("Global default.rules", GLOBAL_CODEX_ROOT / "rules" / "default.rules", True),
         ("Global config.toml (sanitized)", GLOBAL_CODEX_ROOT / "config.toml", True),
     ]
-    for label, path, include in global_files:
-        blocks.extend(file_blocks(label, path, include))
 
-    # 3) 전역 스킬 인벤토리
-    blocks.append(heading2_block("전역 스킬 인벤토리"))
-    global_skills = collect_skill_inventory(GLOBAL_CODEX_ROOT / "skills")
-    if not global_skills:
-        blocks.append(paragraph_block("전역 스킬을 찾지 못했습니다."))
-    else:
-        blocks.append(paragraph_block(f"총 {len(global_skills)}개 SKILL.md"))
-        for sk in global_skills:
-            blocks.append(bullet_block(display_path(sk)))
 
-    # 4) 워크스페이스 규칙/컨텍스트
-    blocks.append(heading2_block("워크스페이스 규칙/컨텍스트"))
-    workspace_files = [
+def workspace_file_targets() -> List[FileTarget]:
+    return [
         ("Workspace AGENTS", WORKSPACE_ROOT / "AGENTS.md", True),
         ("Project Context", WORKSPACE_ROOT / ".agent" / "Project_Context.md", True),
         ("Rules & Skills Summary", WORKSPACE_ROOT / "docs" / "Resources" / "Rules_Skills_Summary.md", True),
@@ -603,36 +1432,33 @@ def build_sync_blocks() -> List[Dict]:
         ("Docs Index", WORKSPACE_ROOT / "docs" / "README.md", True),
         ("Package Scripts", WORKSPACE_ROOT / "package.json", True),
     ]
-    for label, path, include in workspace_files:
-        blocks.extend(file_blocks(label, path, include))
 
-    # 5) Notion 운영 스크립트
-    blocks.append(heading2_block("Notion 운영 스크립트"))
-    notion_ops_files = [
+
+def notion_ops_file_targets() -> List[FileTarget]:
+    return [
         ("Notion Sync Script", WORKSPACE_ROOT / "scripts" / "notion_sync_settings.py", True),
         ("Notion Watch Script", WORKSPACE_ROOT / "scripts" / "notion_sync_watch.py", True),
         ("Notion Bootstrap Pull Script", WORKSPACE_ROOT / "scripts" / "notion_bootstrap_pull.py", True),
         ("Notion Bootstrap Apply Script", WORKSPACE_ROOT / "scripts" / "notion_bootstrap_apply.py", True),
+        ("Notion HTTP Client Module", WORKSPACE_ROOT / "scripts" / "notion_http.py", True),
+        ("Notion Page Registry Module", WORKSPACE_ROOT / "scripts" / "notion_registry.py", True),
+        ("Notion Bootstrap Object Store Module", WORKSPACE_ROOT / "scripts" / "notion_store.py", True),
+        ("Notion Fake API Server", WORKSPACE_ROOT / "scripts" / "notion_fake_server.py", True),
+        ("Notion Smoke Test Script", WORKSPACE_ROOT / "scripts" / "notion_smoke_test.py", True),
         ("WSL Doctor Script", WORKSPACE_ROOT / "scripts" / "wsl_doctor.sh", True),
         ("Supabase WSL Wrapper Script", WORKSPACE_ROOT / "scripts" / "supabase_cli_wsl.sh", True),
         ("Notion Runbook", WORKSPACE_ROOT / "docs" / "Resources" / "Notion_Sync_Runbook.md", True),
         ("Notion Human Guide", WORKSPACE_ROOT / "docs" / "Resources" / "Notion_Human_Guide.md", True),
     ]
-    for label, path, include in notion_ops_files:
-        blocks.extend(file_blocks(label, path, include))
 
-    # 6) 워크스페이스 스킬 본문
-    blocks.append(heading2_block("워크스페이스 스킬"))
-    ws_skills = sorted((WORKSPACE_ROOT / ".agent" / "skills").glob("*/SKILL.md"))
-    if not ws_skills:
-        blocks.append(paragraph_block("워크스페이스 스킬을 찾지 못했습니다."))
-    else:
-        for sk in ws_skills:
-            blocks.extend(file_blocks(f"Workspace Skill: {sk.parent.name}", sk, True))
 
-    # 7) 문서 예시 목록
-    blocks.append(heading2_block("문서 예시"))
-    doc_examples = [
+def workspace_skill_targets() -> List[FileTarget]:
+    skills = sorted((WORKSPACE_ROOT / ".agent" / "skills").glob("*/SKILL.md"))
+    return [(f"Workspace Skill: {sk.parent.name}", sk, True) for sk in skills]
+
+
+def doc_example_targets() -> List[FileTarget]:
+    docs = [
         WORKSPACE_ROOT / "docs" / "Resources" / "PRD" / "README.md",
         WORKSPACE_ROOT / "docs" / "Resources" / "Flow" / "README.md",
         WORKSPACE_ROOT / "docs" / "Resources" / "Design" / "README.md",
@@ -641,13 +1467,331 @@ def build_sync_blocks() -> List[Dict]:
         WORKSPACE_ROOT / "docs" / "TestData" / "README.md",
         WORKSPACE_ROOT / "docs" / "Progress" / "README.md",
     ]
-    for p in doc_examples:
-        blocks.extend(file_blocks(f"Doc Example: {p.name}", p, True))
+    return [(f"Doc Example: {p.name}", p, True) for p in docs]
+
+
+def iter_file_targets() -> Iterator[FileTarget]:
+    yield from global_file_targets()
+    yield from workspace_file_targets()
+    yield from notion_ops_file_targets()
+    yield from workspace_skill_targets()
+    yield from doc_example_targets()
 
-    return blocks
 
+def iter_sync_blocks(options: Optional[SnapshotOptions] = None) -> Iterator[Dict]:
+    opts = options or SnapshotOptions()
+    file_section = iter_toggle_file_blocks if opts.toggle_files else iter_file_blocks
 
-def main() -> int:
+    # 1) 개요
+    yield heading2_block("동기화 개요")
+    yield paragraph_block("MCP 우회 경로(Notion REST API)로 설정 스냅샷을 기록합니다.")
+    yield paragraph_block(f"workspace: {display_path(WORKSPACE_ROOT)}")
+    yield paragraph_block(f"global codex root: {display_path(GLOBAL_CODEX_ROOT)}")
+
+    # 2) 전역 규칙/설정
+    yield heading2_block("전역 규칙/설정")
+    for label, path, include in global_file_targets():
+        yield from file_section(label, path, include, opts)
+
+    # 3) 전역 스킬 인벤토리
+    yield heading2_block("전역 스킬 인벤토리")
+    global_skills = collect_skill_inventory(GLOBAL_CODEX_ROOT / "skills")
+    if not global_skills:
+        yield paragraph_block("전역 스킬을 찾지 못했습니다.")
+    else:
+        yield paragraph_block(f"총 {len(global_skills)}개 SKILL.md")
+        for sk in global_skills:
+            yield bullet_block(display_path(sk))
+
+    # 4) 워크스페이스 규칙/컨텍스트
+    yield heading2_block("워크스페이스 규칙/컨텍스트")
+    for label, path, include in workspace_file_targets():
+        yield from file_section(label, path, include, opts)
+
+    # 5) Notion 운영 스크립트
+    yield heading2_block("Notion 운영 스크립트")
+    for label, path, include in notion_ops_file_targets():
+        yield from file_section(label, path, include, opts)
+
+    # 6) 워크스페이스 스킬 본문
+    yield heading2_block("워크스페이스 스킬")
+    ws_skills = workspace_skill_targets()
+    if not ws_skills:
+        yield paragraph_block("워크스페이스 스킬을 찾지 못했습니다.")
+    else:
+        for label, path, include in ws_skills:
+            yield from file_section(label, path, include, opts)
+
+    # 7) 문서 예시 목록
+    yield heading2_block("문서 예시")
+    for label, path, include in doc_example_targets():
+        yield from file_section(label, path, include, opts)
+
+
+def build_sync_blocks(options: Optional[SnapshotOptions] = None) -> List[Dict]:
+    return list(iter_sync_blocks(options))
+
+
+def build_snapshot_archive(options: Optional[SnapshotOptions] = None) -> Tuple[bytes, Dict]:
+    """
+    대상 파일 전체를 manifest.json이 맨 앞에 오는 tar.gz 하나로 묶는다.
+
+    본문은 블록 모드와 같은 마스킹/본문 한도를 적용하고, manifest에 경로별 sha256/chars와
+    tar 멤버 이름을 기록해 pull이 한 번의 스트리밍 읽기로 복원/검증할 수 있게 한다.
+    """
+    opts = options or SnapshotOptions()
+    entries: List[Dict] = []
+    bodies: List[Tuple[str, bytes]] = []
+    seen: set[str] = set()
+    for label, path, include in iter_file_targets():
+        shown = display_path(path)
+        if shown in seen:
+            continue
+        seen.add(shown)
+        entry: Dict = {"label": label, "path": shown}
+        entries.append(entry)
+        if not path.exists():
+            entry["body"] = "missing"
+            continue
+        if not include:
+            entry["body"] = "omitted"
+            continue
+        sanitized = sanitize_text(read_utf8(path))
+        entry["sha256"] = hashlib.sha256(sanitized.encode("utf-8")).hexdigest()
+        entry["chars"] = len(sanitized)
+        if not opts.reserve(len(sanitized)):
+            entry["body"] = "omitted"
+            continue
+        entry["body"] = "stored"
+        entry["member"] = f"files/{len(bodies) + 1:04d}"
+        bodies.append((entry["member"], sanitized.encode("utf-8")))
+
+    manifest = {"format": 1, "generated_at_utc": now_utc(), "files": entries}
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        members = [(ARCHIVE_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))]
+        for name, data in members + bodies:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue(), manifest
+
+
+def upload_file(token: str, filename: str, data: bytes, content_type: str) -> str:
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise RuntimeError(
+            f"업로드 파일이 {MAX_UPLOAD_BYTES} bytes를 넘습니다({len(data)} bytes). --layout blocks를 사용하세요."
+        )
+    code, body = _request("POST", "/file_uploads", token, {"filename": filename, "content_type": content_type})
+    _raise_if_failed(code, body, "파일 업로드 생성")
+    upload_id = (_json_or_none(body) or {}).get("id")
+    if not isinstance(upload_id, str) or not upload_id:
+        raise RuntimeError("파일 업로드 ID를 파싱할 수 없습니다.")
+    code, body = notion_http.request_multipart(
+        f"/file_uploads/{upload_id}/send", token, "file", filename, data, content_type
+    )
+    _raise_if_failed(code, body, "파일 업로드 전송")
+    return upload_id
+
+
+def reupload_attachment(token: str, blk: Dict) -> Tuple[str, str]:
+    file_obj = blk.get("file") if isinstance(blk.get("file"), dict) else {}
+    hosted = file_obj.get(file_obj.get("type", "file"))
+    url = hosted.get("url") if isinstance(hosted, dict) else None
+    if not isinstance(url, str) or not url:
+        raise RuntimeError("보관할 첨부 파일의 다운로드 주소를 찾을 수 없습니다.")
+    name = str(file_obj.get("name") or "snapshot.tar.gz")
+    with notion_http.open_download(url) as resp:
+        data = resp.read(MAX_UPLOAD_BYTES + 1)
+    return upload_file(token, name, data, "application/gzip"), name
+
+
+def iter_archive_snapshot_blocks(token: str, options: SnapshotOptions) -> Iterator[Dict]:
+    archive, manifest = build_snapshot_archive(options)
+    filename = f"codex-settings-{dt.datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.tar.gz"
+    upload_id = upload_file(token, filename, archive, "application/gzip")
+    stored = sum(1 for entry in manifest["files"] if entry.get("body") == "stored")
+    yield heading2_block("스냅샷 아카이브")
+    yield bullet_block("layout: tar")
+    yield bullet_block(f"archive_sha256: {hashlib.sha256(archive).hexdigest()}")
+    yield bullet_block(f"archive_bytes: {len(archive)}")
+    yield bullet_block(f"archive_files: {stored}/{len(manifest['files'])}")
+    yield bullet_block(f"archive_upload_id: {upload_id}")
+    yield file_upload_block(upload_id, filename)
+
+
+def sync_current_page(
+    token: str,
+    settings_page_id: str,
+    options: SnapshotOptions,
+) -> Tuple[str, str, Dict[str, int]]:
+    # 고정된 현재 페이지를 다시 만들지 않고, 새 블록 목록과 비교해 달라진 블록만 갱신한다.
+    current_id = ensure_registered_page(
+        token, "current", settings_page_id, CURRENT_PAGE_TITLE, CURRENT_INTRO_LINES
+    )
+    changelog_id = ensure_registered_page(
+        token,
+        "changelog",
+        settings_page_id,
+        CHANGELOG_PAGE_TITLE,
+        ["현재 스냅샷 페이지의 실행별 파일 변경 이력입니다."],
+    )
+    options.page_id = current_id
+    desired = [paragraph_block(line) for line in CURRENT_INTRO_LINES]
+    desired.extend(iter_sync_blocks(options))
+    existing = list_block_children(token, current_id)
+    counts = patch_page_blocks(token, current_id, existing, desired)
+    return current_id, changelog_id, counts
+
+
+def changelog_blocks(
+    previous: Dict[str, Dict[str, str]],
+    recorded: Dict[str, Dict[str, str]],
+    counts: Dict[str, int],
+    omitted: Iterable[str] = (),
+) -> List[Dict]:
+    lines: List[str] = []
+    omitted = set(omitted)
+    for path in sorted(set(previous) | set(recorded) | omitted):
+        old_sha = previous.get(path, {}).get("sha256", "")
+        new_sha = recorded.get(path, {}).get("sha256", "")
+        if path in omitted:
+            # 본문 한도 때문에 빠진 파일은 삭제가 아니다(이전 해시는 인덱스에 그대로 남긴다).
+            if previous.get(path, {}).get("body") == "omitted":
+                continue
+            lines.append(f"omitted: {path} (본문 한도 초과{f', 이전 {old_sha[:12]}' if old_sha else ''})")
+            continue
+        if old_sha == new_sha:
+            continue
+        if not old_sha:
+            lines.append(f"added: {path} ({new_sha[:12]})")
+        elif not new_sha:
+            lines.append(f"removed: {path} ({old_sha[:12]})")
+        else:
+            lines.append(f"changed: {path} ({old_sha[:12]} -> {new_sha[:12]})")
+    if not lines and not (counts["updated"] or counts["inserted"] or counts["deleted"]):
+        return []
+    summary = (
+        f"blocks: kept {counts['kept']} / updated {counts['updated']} / "
+        f"inserted {counts['inserted']} / deleted {counts['deleted']}"
+    )
+    return [heading3_block(now_utc())] + [bullet_block(line) for line in lines] + [bullet_block(summary)]
+
+
+def create_snapshot_page(
+    token: str,
+    settings_page_id: str,
+    options: SnapshotOptions,
+    layout: str = "blocks",
+) -> Tuple[str, str]:
+    title = f"{SNAPSHOT_TITLE_PREFIX} {dt.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%SZ')}"
+    if layout == "tar":
+        stream = iter_archive_snapshot_blocks(token, options)
+    else:
+        stream = notion_http.prefetch(iter_sync_blocks(options), PREFETCH_BLOCKS)
+    intro_lines = snapshot_intro_lines()
+    # 첫 배치도 블록 수와 바이트 상한을 함께 지켜 페이지 생성 요청에 싣는다.
+    batches = APPEND_BATCHER.batches(stream, MAX_CHILDREN_PER_REQUEST - len(intro_lines))
+    page_id, page_url = create_child_page(
+        token,
+        settings_page_id,
+        title,
+        intro_lines=intro_lines,
+        content_blocks=next(batches, []),
+    )
+    try:
+        append_batches(token, page_id, batches)
+    except Exception:
+        # 재시도 후에도 실패하면 반쯤 채워진 스냅샷이 최신으로 복구되지 않도록 정리한다.
+        # 정리 실패는 기록만 하고, 호출자에게는 원래 실패를 그대로 올린다.
+        try:
+            archive_page(token, page_id)
+        except Exception as cleanup_exc:
+            eprint(f"미완성 스냅샷 정리 실패(page_id={page_id}): {cleanup_exc}")
+        raise
+    finally:
+        stream.close()
+    return page_id, page_url
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Codex/Workspace 설정 스냅샷을 Notion에 동기화")
+    parser.add_argument(
+        "--pack-code",
+        action="store_true",
+        help="파일 본문을 code 블록당 rich_text 세그먼트 최대 100개로 채워 블록/요청 수를 줄임",
+    )
+    parser.add_argument(
+        "--max-total-chars",
+        type=int,
+        default=DEFAULT_MAX_TOTAL_CHARS,
+        help="스냅샷 전체 본문 글자 수 한도(넘치는 파일은 잘리지 않고 본문 없이 기록)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="이전 스냅샷과 내용이 같은 파일은 본문 대신 참조(path, sha256, 원본 스냅샷 page_id)만 기록",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=("blocks", "toggle", "tar"),
+        default="blocks",
+        help="blocks=파일별 code 블록으로 기록, toggle=파일별 블록을 'file: <path>' toggle 하위에 기록"
+        "(pull --path/--glob이 해당 파일만 받음), tar=대상 전체를 tar.gz 하나로 묶어 첨부(요청 수 최소화)",
+    )
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help=f"새 스냅샷 페이지 대신 '{CURRENT_PAGE_TITLE}' 페이지를 바뀐 블록만 제자리 갱신하고 이력은 변경 로그로 남김",
+    )
+    parser.add_argument(
+        "--archive-strategy",
+        choices=("copy", "reference"),
+        default="copy",
+        help="이전 스냅샷 처리 방식: copy=old로 블록 복사 후 아카이브, "
+        "reference=원본은 그대로 두고 old 색인에 링크/파일 해시만 기록(페이지당 O(1) 요청)",
+    )
+    parser.add_argument(
+        "--keep-last",
+        type=int,
+        default=0,
+        help="old 보존 정책: 최근 보관본 N개 유지(--keep-* 중 하나라도 주면 나머지는 휴지통으로 정리)",
+    )
+    parser.add_argument("--keep-daily", type=int, default=0, help="old 보존 정책: 최근 N일 각각의 최신 보관본 유지")
+    parser.add_argument("--keep-weekly", type=int, default=0, help="old 보존 정책: 최근 N주 각각의 최신 보관본 유지")
+    parser.add_argument(
+        "--compress",
+        choices=sorted(COMPRESSORS),
+        default=None,
+        help="큰 파일 본문을 압축 후 base85 텍스트로 기록해 블록/요청 수를 줄임",
+    )
+    parser.add_argument(
+        "--compress-min-chars",
+        type=int,
+        default=DEFAULT_COMPRESS_MIN_CHARS,
+        help="--compress 적용 최소 본문 글자 수(이보다 작은 파일은 평문 유지)",
+    )
+    args = parser.parse_args(argv)
+    if min(args.keep_last, args.keep_daily, args.keep_weekly) < 0:
+        parser.error("--keep-* 값은 0 이상이어야 합니다.")
+    if args.in_place and (args.incremental or args.layout != "blocks"):
+        parser.error("--in-place는 --incremental, --layout toggle/tar와 함께 쓸 수 없습니다.")
+    if args.incremental and args.layout == "tar":
+        parser.error("--incremental은 --layout tar와 함께 쓸 수 없습니다(아카이브에는 파일별 참조를 기록하지 않음).")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    options = SnapshotOptions(
+        pack_code=args.pack_code,
+        max_total_chars=args.max_total_chars,
+        incremental=args.incremental,
+        compress=args.compress,
+        compress_min_chars=args.compress_min_chars,
+        toggle_files=args.layout == "toggle",
+    )
     load_token_from_dotenv_if_missing()
     token = os.getenv(TOKEN_ENV, "").strip()
     if not token:
@@ -655,50 +1799,108 @@ def main() -> int:
         return 1
 
     try:
-        root_page_id = find_root_page_id(token)
-        settings_page_id = ensure_child_page(
-            token,
-            root_page_id,
-            SETTINGS_PAGE_TITLE,
-            "Codex 설정 스냅샷 전용 페이지",
-        )
-        archive_page_id = ensure_child_page(
-            token,
-            settings_page_id,
-            ARCHIVE_PAGE_TITLE,
-            "오래된 Codex 설정 스냅샷 보관 페이지",
-        )
+        root_page_id, settings_page_id, archive_page_id = resolve_sync_pages(token)
+
+        if options.incremental:
+            # 참조 대상은 settings 하위에 살아 있는 스냅샷 페이지만 허용한다(목록은 아카이브 단계에서 재사용).
+            # --in-place 현재 페이지는 다음 실행에서 내용이 바뀌므로 참조 대상에서 뺀다.
+            live_ids = {blk.get("id") for blk in CHILD_LISTINGS.get(token, settings_page_id)}
+            live_ids.discard(notion_registry.PageRegistry.load(token).get("current"))
+            options.previous_files = {
+                key: info
+                for key, info in notion_registry.load_sync_index(token).items()
+                if info.get("page_id") in live_ids
+            }
 
-        title = f"{SNAPSHOT_TITLE_PREFIX} {dt.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%SZ')}"
-        page_id, page_url = create_child_page(token, settings_page_id, title)
-        blocks = build_sync_blocks()
-        append_children(token, page_id, blocks)
+        block_counts: Optional[Dict[str, int]] = None
+        if args.in_place:
+            previous_index = notion_registry.load_sync_index(token)
+            page_id, changelog_id, block_counts = sync_current_page(token, settings_page_id, options)
+            page_url = f"https://www.notion.so/{page_id.replace('-', '')}"
+            entry = changelog_blocks(previous_index, options.recorded_files, block_counts, options.omitted_files)
+            if entry:
+                append_children(token, changelog_id, entry)
+        else:
+            page_id, page_url = create_snapshot_page(token, settings_page_id, options, args.layout)
+        options.bind_page(page_id)
+        sync_index = options.recorded_files
+        if args.in_place:
+            # 현재 페이지는 제자리에서 바뀌므로 증분 참조 대상(page_id) 없이 변경 로그용 해시만 남긴다.
+            sync_index = {path: {"sha256": info["sha256"]} for path, info in options.recorded_files.items()}
+            for path in options.omitted_files:
+                sync_index[path] = {**previous_index.get(path, {}), "body": "omitted"}
+                sync_index[path].pop("page_id", None)
+        # tar 레이아웃처럼 파일별 기록이 없는 실행은 이전 증분 인덱스를 덮어쓰지 않는다.
+        if sync_index:
+            try:
+                notion_registry.save_sync_index(token, sync_index)
+            except OSError as exc:
+                eprint(f"증분 인덱스 저장 실패(무시): {exc}")
+        snapshot_hashes = notion_registry.load_snapshot_hashes(token)
+        snapshot_hashes[notion_registry.normalize_page_id(page_id)] = {
+            path: info["sha256"] for path, info in options.recorded_files.items()
+        }
 
-        moved_a, failed_a = archive_snapshot_pages(
-            token,
-            source_parent_id=settings_page_id,
-            archive_parent_id=archive_page_id,
-            keep_page_ids={page_id},
-            skip_page_ids=set(),
-        )
-        moved_b, failed_b = archive_snapshot_pages(
-            token,
-            source_parent_id=root_page_id,
-            archive_parent_id=archive_page_id,
-            keep_page_ids={page_id},
-            skip_page_ids={settings_page_id, archive_page_id},
+        # 새 스냅샷이 참조하는 이전 스냅샷 페이지는 본문 원본이므로 보관 이동하지 않는다.
+        keep_page_ids = {page_id} | options.referenced_page_ids()
+        # settings 하위와 루트 하위 목록 조회는 서로 독립적이므로 병렬로 처리한다.
+        archive_sources = [
+            (settings_page_id, set()),
+            (root_page_id, {settings_page_id, archive_page_id}),
+        ]
+        candidate_lists = notion_http.map_concurrently(
+            lambda spec: collect_archive_candidates(
+                token,
+                source_parent_id=spec[0],
+                archive_parent_id=archive_page_id,
+                keep_page_ids=keep_page_ids,
+                skip_page_ids=spec[1],
+            ),
+            archive_sources,
         )
+        candidates = [item for items in candidate_lists for item in items]
+        if args.archive_strategy == "reference":
+            moved, move_failed, archive_timings = archive_snapshot_references(
+                token, candidates, archive_page_id, snapshot_hashes
+            )
+        else:
+            moved, move_failed, archive_timings = archive_snapshot_pages(token, candidates, archive_page_id)
+
+        retention = RetentionPolicy(args.keep_last, args.keep_daily, args.keep_weekly)
+        pruned, prune_failed = prune_archive(token, archive_page_id, retention, keep_page_ids)
+
+        # 보관 색인에 기록됐거나 아카이브된 페이지의 해시는 로컬 상태에서 정리한다.
+        pending_ids = keep_page_ids | {pid for pid, status, _ in archive_timings if status == "failed"}
+        pending_keys = {notion_registry.normalize_page_id(pid) for pid in pending_ids}
+        try:
+            notion_registry.save_snapshot_hashes(
+                token, {key: value for key, value in snapshot_hashes.items() if key in pending_keys}
+            )
+        except OSError as exc:
+            eprint(f"스냅샷 해시 저장 실패(무시): {exc}")
     except Exception as exc:
         eprint(f"동기화 실패: {exc}")
         return 2
 
+    throttle = notion_http.throttle_report()
     print("SYNC_RESULT=SUCCESS")
     print(f"SYNC_PAGE_ID={page_id}")
     print(f"SYNC_PAGE_URL={page_url}")
     print(f"SYNC_SETTINGS_PAGE_ID={settings_page_id}")
     print(f"SYNC_ARCHIVE_PAGE_ID={archive_page_id}")
-    print(f"SYNC_ARCHIVED_TO_OLD={moved_a + moved_b}")
-    print(f"SYNC_MOVE_FAILED={failed_a + failed_b}")
+    print(f"SYNC_ARCHIVED_TO_OLD={moved}")
+    print(f"SYNC_MOVE_FAILED={move_failed}")
+    print(f"SYNC_PRUNED={pruned}")
+    print(f"SYNC_PRUNE_FAILED={prune_failed}")
+    print(f"SYNC_FILES_REFERENCED={sum(1 for info in options.recorded_files.values() if info['page_id'] != page_id)}")
+    if block_counts is not None:
+        for key in ("kept", "updated", "inserted", "deleted"):
+            print(f"SYNC_BLOCKS_{key.upper()}={block_counts[key]}")
+    for archived_id, status, elapsed in archive_timings:
+        print(f"SYNC_ARCHIVE_TIMING={archived_id} {status} {elapsed:.2f}s")
+    print(f"SYNC_REQUESTS={int(throttle['requests'])}")
+    print(f"SYNC_RETRIES={int(throttle['retries'])}")
+    print(f"SYNC_THROTTLED_SEC={throttle['throttled_sec']}")
     return 0
 
 
@@ -14,7 +14,7 @@ import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 WORKSPACE_ROOT = Path(__file__).resolve().parents[1]
@@ -47,6 +47,11 @@ def collect_targets(include_global: bool) -> List[Path]:
         WORKSPACE_ROOT / "scripts" / "notion_sync_settings.py",
         WORKSPACE_ROOT / "scripts" / "notion_sync_watch.py",
         WORKSPACE_ROOT / "scripts" / "notion_bootstrap_pull.py",
+        WORKSPACE_ROOT / "scripts" / "notion_http.py",
+        WORKSPACE_ROOT / "scripts" / "notion_registry.py",
+        WORKSPACE_ROOT / "scripts" / "notion_store.py",
+        WORKSPACE_ROOT / "scripts" / "notion_fake_server.py",
+        WORKSPACE_ROOT / "scripts" / "notion_smoke_test.py",
         WORKSPACE_ROOT / "scripts" / "supabase_cli_wsl.sh",
         WORKSPACE_ROOT / "scripts" / "wsl_doctor.sh",
         WORKSPACE_ROOT / "docs" / "Resources" / "Notion_Sync_Runbook.md",
@@ -97,12 +102,12 @@ def detect_changes(before: Dict[Path, FileState], after: Dict[Path, FileState])
     return changed
 
 
-def run_sync(dry_run: bool) -> int:
+def run_sync(dry_run: bool, sync_args: Optional[List[str]] = None) -> int:
     if dry_run:
         print("WATCH_SYNC=SKIPPED(dry-run)")
         return 0
 
-    cmd = [sys.executable, str(SYNC_SCRIPT)]
+    cmd = [sys.executable, str(SYNC_SCRIPT), *(sync_args or [])]
     proc = subprocess.run(cmd, capture_output=True, text=True)
     print(f"WATCH_SYNC_EXIT={proc.returncode}")
     if proc.stdout.strip():
@@ -123,14 +128,15 @@ def main() -> int:
         action="store_true",
         help="~/.codex 전역 파일 감시 제외",
     )
-    args = parser.parse_args()
+    # 알 수 없는 옵션(예: --pack-code)은 동기화 스크립트에 그대로 넘긴다.
+    args, sync_args = parser.parse_known_args()
 
     if not SYNC_SCRIPT.exists():
         print(f"동기화 스크립트를 찾을 수 없습니다: {SYNC_SCRIPT}", file=sys.stderr)
         return 1
 
     if args.once:
-        return run_sync(args.dry_run)
+        return run_sync(args.dry_run, sync_args)
 
     targets = collect_targets(include_global=not args.no_global)
     print(f"WATCH_TARGETS={len(targets)}")
@@ -161,7 +167,7 @@ def main() -> int:
 
             if pending and (time.time() - last_change_at) >= max(args.debounce, 0.0):
                 print("WATCH_DEBOUNCE_OK=YES")
-                rc = run_sync(args.dry_run)
+                rc = run_sync(args.dry_run, sync_args)
                 if rc != 0:
                     print("WATCH_SYNC_STATUS=FAILED", file=sys.stderr)
                 else: